@@ -65,6 +65,25 @@ LOCAL_EMBEDDING_MODEL = os.environ.get("LOCAL_EMBEDDING_MODEL", "Qwen/Qwen3-Embe
 EXTERNAL_EMBEDDING_MODEL = os.environ.get("EXTERNAL_EMBEDDING_MODEL", "text-embedding-3-small")
 EMBEDDING_API_URL = os.environ.get("EMBEDDING_API_URL", "https://api.openai.com/v1")
 EMBEDDING_API_KEY = os.environ.get("EMBEDDING_API_KEY", "")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "0"))  # texts per local forward pass (0 = 32 on GPU, 8 on CPU)
+EMBEDDING_CPU_THREADS = int(os.environ.get("EMBEDDING_CPU_THREADS", "0"))  # torch threads on CPU (0 = min(8, cores))
+EMBEDDING_CPU_PROCESSES = int(os.environ.get("EMBEDDING_CPU_PROCESSES", "0"))  # worker processes for large CPU encodes (0/1 = off)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")  # "torch", "onnx" or "openvino" for the local model
+EMBEDDING_ATTN_IMPLEMENTATION = os.environ.get("EMBEDDING_ATTN_IMPLEMENTATION", "")  # e.g. "sdpa" or "flash_attention_2" ("" = model default)
+EMBEDDING_COMPILE = os.environ.get("EMBEDDING_COMPILE", "false").lower() == "true"  # torch.compile the local model at load
+EMBEDDING_MAX_SEQ_LENGTH = int(os.environ.get("EMBEDDING_MAX_SEQ_LENGTH", "0"))  # token limit per text for the local model (0 = model default)
+EMBEDDING_FP16 = os.environ.get("EMBEDDING_FP16", "true").lower() == "true"  # half precision for the local model on GPU/MPS
+EMBEDDING_HALF_DTYPE = os.environ.get("EMBEDDING_HALF_DTYPE", "float16")  # "float16" or "bfloat16" when EMBEDDING_FP16 is on
+EMBEDDING_API_BATCH_SIZE = int(os.environ.get("EMBEDDING_API_BATCH_SIZE", "64"))  # texts per external API request
+EMBEDDING_API_CONCURRENCY = int(os.environ.get("EMBEDDING_API_CONCURRENCY", "8"))  # concurrent external API requests per batch
+EMBEDDING_API_ENCODING_FORMAT = os.environ.get("EMBEDDING_API_ENCODING_FORMAT", "base64")  # "base64" or "float"
+EMBEDDING_WARMUP = os.environ.get("EMBEDDING_WARMUP", "true").lower() == "true"  # warm up the embedder in the background at server startup
+EMBEDDING_WARMUP_EXTERNAL = os.environ.get("EMBEDDING_WARMUP_EXTERNAL", "false").lower() == "true"  # also send one (billable) warmup request to an external API
+EMBEDDING_CACHE_CAPACITY = int(os.environ.get("EMBEDDING_CACHE_CAPACITY", "10000"))  # in-memory embeddings kept (0 = off)
+EMBEDDING_QUERY_CACHE_CAPACITY = int(os.environ.get("EMBEDDING_QUERY_CACHE_CAPACITY", "512"))  # in-memory query embeddings kept (0 = off)
+EMBEDDING_DISK_CACHE = os.environ.get("EMBEDDING_DISK_CACHE", "true").lower() == "true"  # persist embeddings across runs
+EMBEDDING_DISK_CACHE_PATH = str(_PROJECT_ROOT / "chroma_db" / "embedding_cache.sqlite3")
+EMBEDDING_DISK_CACHE_MAX_ROWS = int(os.environ.get("EMBEDDING_DISK_CACHE_MAX_ROWS", "200000"))  # on-disk embeddings kept, least recently used pruned (0 = unbounded)
 
 # Document chunking
 MAX_CHUNK_CHARS = int(os.environ.get("MAX_CHUNK_CHARS", "1000"))
@@ -91,7 +110,16 @@ QUERY_AUGMENTATION_API_KEY = os.environ.get("QUERY_AUGMENTATION_API_KEY", EXTERN
 MIN_COSINE_SIMILARITY = float(os.environ.get("MIN_COSINE_SIMILARITY", "0.05"))
 SEARCH_MULTIPLIER = int(os.environ.get("SEARCH_MULTIPLIER", "3"))
 RRF_K = int(os.environ.get("RRF_K", "60"))
+FUSION_METHOD = os.environ.get("FUSION_METHOD", "rrf").lower()  # "rrf" or "combsum"
+FUSION_ALPHA = float(os.environ.get("FUSION_ALPHA", "0.5"))  # CombSUM weight of the vector score
 MAX_SEARCH_RESULTS = int(os.environ.get("MAX_SEARCH_RESULTS", "30"))
+MAX_BM25_CACHED_FIGURES = int(os.environ.get("MAX_BM25_CACHED_FIGURES", "16"))  # BM25 indexes kept in memory (0 = unlimited)
+SEARCH_RESULT_CACHE_SIZE = int(os.environ.get("SEARCH_RESULT_CACHE_SIZE", "128"))  # recent hybrid searches reused until the figure changes (0 = off)
+
+# Vector index (HNSW) parameters for new figure collections; 0 = ChromaDB default
+HNSW_M = int(os.environ.get("HNSW_M", "0"))
+HNSW_CONSTRUCTION_EF = int(os.environ.get("HNSW_CONSTRUCTION_EF", "0"))
+HNSW_SEARCH_EF = int(os.environ.get("HNSW_SEARCH_EF", "0"))
 
 
 def validate_config() -> list[str]:
@@ -131,6 +159,12 @@ def validate_config() -> list[str]:
     if not (0 <= MIN_COSINE_SIMILARITY <= 1):
         errors.append(f"MIN_COSINE_SIMILARITY must be between 0 and 1, got: {MIN_COSINE_SIMILARITY}")
     
+    if FUSION_METHOD not in ("rrf", "combsum"):
+        errors.append(f"FUSION_METHOD must be 'rrf' or 'combsum', got: {FUSION_METHOD}")
+    
+    if not (0 <= FUSION_ALPHA <= 1):
+        errors.append(f"FUSION_ALPHA must be between 0 and 1, got: {FUSION_ALPHA}")
+    
     if APP_PORT < 1 or APP_PORT > 65535:
         errors.append(f"APP_PORT must be between 1 and 65535, got: {APP_PORT}")
     
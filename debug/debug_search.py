@@ -57,7 +57,7 @@ def debug_search(figure_id="zhenghe", query="你去過東南亞、南亞、中
         print(f"Document ID: {doc_id}")
         print(f"Cosine similarity: {result.get('cosine_similarity', 0):.3f}")
         print(f"BM25 score: {result.get('bm25_score', 0):.6f}")
-        print(f"RRF score: {result.get('rrf_score', 0):.6f}")
+        print(f"Fused score ({result.get('fusion_method', 'rrf')}): {result.get('fused_score', 0):.6f}")
         print(f"Top matching words: {result.get('top_matching_words', [])}")
         print()
         
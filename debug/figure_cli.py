@@ -17,10 +17,14 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 from figure_manager import get_figure_manager
 from document_processor import DocumentProcessor
+from config import MAX_SEARCH_RESULTS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Chunks embedded and inserted per call when uploading
+UPLOAD_BATCH_SIZE = 64
+
 class FigureCLI:
     def __init__(self):
         self.figure_manager = get_figure_manager()
@@ -156,10 +160,6 @@ class FigureCLI:
                 continue
             
             try:
-                # Read file content
-                with open(file_path, 'rb') as f:
-                    file_content = f.read()
-                
                 # Determine file type
                 file_extension = Path(file_path).suffix.lower()
                 if file_extension == '.pdf':
@@ -172,20 +172,21 @@ class FigureCLI:
                     print(f"✗ Unsupported file type: {file_path}")
                     continue
                 
-                # Process the file into chunks
+                # Process the file into chunks, parsing straight from the open file
                 filename = Path(file_path).name
-                chunks = document_processor.process_file(file_content, filename, file_type)
+                with open(file_path, 'rb') as f:
+                    chunks = document_processor.process_file(f, filename, file_type)
                 
-                # Add each chunk to the figure's collection
+                # Add chunks in slices (one encode + insert each) to bound embedding memory
                 chunk_count = 0
-                for chunk in chunks:
-                    doc_id = self.figure_manager.add_document_to_figure(
+                for start in range(0, len(chunks), UPLOAD_BATCH_SIZE):
+                    batch = chunks[start:start + UPLOAD_BATCH_SIZE]
+                    doc_ids = self.figure_manager.add_documents_to_figure(
                         figure_id=figure_id,
-                        text=chunk['text'],
-                        metadata=chunk['metadata']
+                        texts=[chunk['text'] for chunk in batch],
+                        metadatas=[chunk['metadata'] for chunk in batch]
                     )
-                    if doc_id:
-                        chunk_count += 1
+                    chunk_count += len(doc_ids)
                 
                 print(f"✓ Uploaded {filename}: {chunk_count} chunks added")
                 successful_uploads += 1
@@ -197,6 +198,8 @@ class FigureCLI:
         print(f"\nUpload Summary: {successful_uploads}/{total_files} files processed successfully.")
         
         if successful_uploads > 0:
+            # Persist the updated document count once for the whole upload
+            self.figure_manager.flush()
             self.figure_manager._invalidate_bm25_cache(figure_id)
             print(f"BM25 cache invalidated for {figure_id} (will rebuild on next search)")
         
@@ -212,6 +215,11 @@ class FigureCLI:
         query = args.query
         n_results = args.limit or 5
         
+        # Hybrid search never returns more than MAX_SEARCH_RESULTS, so don't ask for more
+        if n_results > MAX_SEARCH_RESULTS or n_results < 1:
+            n_results = max(1, min(n_results, MAX_SEARCH_RESULTS))
+            print(f"Limit clamped to {n_results} (MAX_SEARCH_RESULTS={MAX_SEARCH_RESULTS})")
+        
         if not self.figure_manager.get_figure_metadata(figure_id):
             print(f"Figure '{figure_id}' not found.")
             return False
@@ -274,7 +282,7 @@ def main():
     search_parser = subparsers.add_parser('search', help='Search documents for a specific figure')
     search_parser.add_argument('figure_id', help='Figure identifier')
     search_parser.add_argument('query', help='Search query')
-    search_parser.add_argument('--limit', type=int, help='Number of results to return (default: 5)')
+    search_parser.add_argument('--limit', type=int, help=f'Number of results to return (default: 5, max: {MAX_SEARCH_RESULTS})')
     
     args = parser.parse_args()
     
@@ -310,6 +318,8 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        cli.figure_manager.close()
 
 if __name__ == '__main__':
     main()
@@ -27,6 +27,9 @@ from document_processor import DocumentProcessor
 from validators import validate_figure_data, sanitize_figure_id, sanitize_figure_name
 from config import ALLOWED_EXTENSIONS, ALLOWED_IMAGE_EXTENSIONS, FIGURE_IMAGES_DIR, ADMIN_PASSWORD, TEMP_UPLOAD_DIR, OVERLAP_PERCENT
 
+# Chunks encoded and stored per call in the streaming upload; progress is reported after each batch
+STREAM_UPLOAD_BATCH_SIZE = 32
+
 
 def secure_filename(filename: str) -> str:
     """
@@ -532,22 +535,23 @@ async def upload_documents(
                     )
                     file_result['total_chunks'] = len(chunks)
                     
-                    chunk_count = 0
-                    for chunk_index, chunk in enumerate(chunks):
+                    chunk_metadatas = []
+                    for chunk in chunks:
                         chunk_metadata = chunk['metadata'].copy()
                         chunk_metadata['original_filename'] = original_filename
-                        
-                        doc_id = await figure_manager.add_document_to_figure_async(
-                            figure_id=figure_id,
-                            text=chunk['text'],
-                            metadata=chunk_metadata
-                        )
-                        if doc_id:
-                            chunk_count += 1
-                            file_result['chunks'].append({
-                                'index': chunk_index,
-                                'success': True
-                            })
+                        chunk_metadatas.append(chunk_metadata)
+                    
+                    # One batched encode + insert for the whole file
+                    doc_ids = await figure_manager.add_documents_to_figure_async(
+                        figure_id=figure_id,
+                        texts=[chunk['text'] for chunk in chunks],
+                        metadatas=chunk_metadatas
+                    )
+                    chunk_count = len(doc_ids)
+                    file_result['chunks'] = [
+                        {'index': chunk_index, 'success': True}
+                        for chunk_index in range(chunk_count)
+                    ]
                     
                     if chunk_count > 0:
                         file_result['status'] = 'success'
@@ -673,21 +677,25 @@ async def upload_documents_stream(
                     yield f"data: {json.dumps({'event': 'chunks_count', 'file_index': file_index, 'total_chunks': total_chunks})}\n\n"
                     
                     chunk_count = 0
-                    for chunk_index, chunk in enumerate(chunks):
-                        chunk_metadata = chunk['metadata'].copy()
-                        chunk_metadata['original_filename'] = original_filename
+                    for start in range(0, total_chunks, STREAM_UPLOAD_BATCH_SIZE):
+                        batch = chunks[start:start + STREAM_UPLOAD_BATCH_SIZE]
+                        texts = [chunk['text'] for chunk in batch]
+                        metadatas = []
+                        for chunk in batch:
+                            chunk_metadata = chunk['metadata'].copy()
+                            chunk_metadata['original_filename'] = original_filename
+                            metadatas.append(chunk_metadata)
                         
-                        doc_id = await figure_manager.add_document_to_figure_async(
+                        doc_ids = await figure_manager.add_documents_to_figure_async(
                             figure_id=figure_id,
-                            text=chunk['text'],
-                            metadata=chunk_metadata
+                            texts=texts,
+                            metadatas=metadatas
                         )
-                        if doc_id:
-                            chunk_count += 1
+                        chunk_count += len(doc_ids)
                         
-                        if (chunk_index + 1) % 5 == 0 or chunk_index == len(chunks) - 1:
-                            progress = ((chunk_index + 1) / total_chunks) * 100
-                            yield f"data: {json.dumps({'event': 'chunk_progress', 'file_index': file_index, 'chunks_processed': chunk_index + 1, 'total_chunks': total_chunks, 'progress': progress})}\n\n"
+                        chunks_processed = start + len(batch)
+                        progress = (chunks_processed / total_chunks) * 100
+                        yield f"data: {json.dumps({'event': 'chunk_progress', 'file_index': file_index, 'chunks_processed': chunks_processed, 'total_chunks': total_chunks, 'progress': progress})}\n\n"
                     
                     if chunk_count > 0:
                         successful_uploads += 1
@@ -5,6 +5,7 @@ Handles chat interface and conversation functionality with async support.
 
 import re
 import json
+import orjson
 import logging
 import os
 
@@ -589,7 +590,8 @@ async def chat(request: Request, chat_request: ChatRequest):
                     if 'content' in chunk:
                         content = chunk['content']
                         full_response += content
-                        yield f"data: {json.dumps({'content': content})}\n\n"
+                        # Once per streamed token; orjson is several times faster than json.dumps
+                        yield f"data: {orjson.dumps({'content': content}).decode()}\n\n"
                     
                     if chunk.get('done', False):
                         async with session_lock:
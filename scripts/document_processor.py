@@ -3,8 +3,9 @@ Document processing utilities for extracting text from PDFs, text files, and DOC
 and chunking them for vector storage.
 """
 
+import math
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Union
 import PyPDF2
 import logging
 from io import BytesIO
@@ -13,6 +14,17 @@ logger = logging.getLogger('histfig')
 from docx import Document
 from config import MAX_CHUNK_CHARS, OVERLAP_PERCENT
 
+# Whitespace runs collapsed to a single space before chunking
+_WS_RE = re.compile(r'\s+')
+
+# Chinese and English punctuation marks that indicate good break points
+_BREAK_CHARS = '。！？；.!?;\n '
+_OVERLAP_BREAK_RE = re.compile(r'[ \n。！？；.!?;]')
+
+# How far (in characters) to look for a break point around a chunk boundary
+_BREAK_SEARCH_WINDOW = 50
+
+
 class DocumentProcessor:
     def __init__(self, max_chunk_chars: int = None, overlap_percent: int = None):
         """
@@ -28,25 +40,42 @@ class DocumentProcessor:
         # Calculate overlap from percentage
         self.char_overlap = int(self.max_chunk_chars * self.overlap_percent / 100)
     
-    def extract_text_from_pdf(self, file_content: bytes) -> str:
+    @staticmethod
+    def _as_stream(file_content: Union[bytes, BinaryIO]) -> BinaryIO:
+        """Wrap bytes in a stream; open binary files are used as-is."""
+        if isinstance(file_content, (bytes, bytearray)):
+            return BytesIO(file_content)
+        return file_content
+    
+    @staticmethod
+    def _content_size(file_content: Union[bytes, BinaryIO]) -> int:
+        """Size in bytes of file content given as bytes or a seekable stream."""
+        if isinstance(file_content, (bytes, bytearray)):
+            return len(file_content)
+        position = file_content.tell()
+        size = file_content.seek(0, 2)
+        file_content.seek(position)
+        return size
+    
+    def extract_text_from_pdf(self, file_content: Union[bytes, BinaryIO]) -> str:
         """
         Extract text from PDF file content.
         
         Args:
-            file_content: PDF file content as bytes
+            file_content: PDF file content as bytes or an open binary file
             
         Returns:
             Extracted text
         """
         try:
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            # PdfReader seeks within the stream, so an open file is read page by page
+            pdf_reader = PyPDF2.PdfReader(self._as_stream(file_content))
             
             text = ""
             for page in pdf_reader.pages:
                 try:
                     page_text = page.extract_text()
-                    if page_text.strip():
+                    if page_text and not page_text.isspace():
                         # Ensure a space between pages so words at page
                         # boundaries don't merge when whitespace is later
                         # normalized (e.g. "word\nword" → "word word").
@@ -62,17 +91,20 @@ class DocumentProcessor:
             logger.error(f"Error extracting text from PDF: {e}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
-    def extract_text_from_txt(self, file_content: bytes) -> str:
+    def extract_text_from_txt(self, file_content: Union[bytes, BinaryIO]) -> str:
         """
         Extract text from text file content.
         
         Args:
-            file_content: Text file content as bytes
+            file_content: Text file content as bytes or an open binary file
             
         Returns:
             Extracted text
         """
         try:
+            if not isinstance(file_content, (bytes, bytearray)):
+                file_content = file_content.read()
+            
             # Try different encodings
             encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
             
@@ -91,36 +123,41 @@ class DocumentProcessor:
             logger.error(f"Error extracting text from text file: {e}")
             raise Exception(f"Failed to extract text from text file: {str(e)}")
     
-    def extract_text_from_docx(self, file_content: bytes) -> str:
+    def extract_text_from_docx(self, file_content: Union[bytes, BinaryIO]) -> str:
         """
         Extract text from DOCX file content.
         
         Args:
-            file_content: DOCX file content as bytes
+            file_content: DOCX file content as bytes or an open binary file
             
         Returns:
             Extracted text
         """
         try:
-            docx_file = BytesIO(file_content)
-            doc = Document(docx_file)
+            doc = Document(self._as_stream(file_content))
             
-            text = ""
+            # Collect pieces and join once; repeated += is quadratic on
+            # documents with large tables. Surrounding whitespace is left
+            # in place since chunk_text normalizes it anyway.
+            parts = []
+            append = parts.append
             for paragraph in doc.paragraphs:
-                paragraph_text = paragraph.text.strip()
-                if paragraph_text:
-                    text += paragraph_text + "\n"
+                paragraph_text = paragraph.text
+                if paragraph_text and not paragraph_text.isspace():
+                    append(paragraph_text)
+                    append("\n")
             
             # Extract text from tables
             for table in doc.tables:
                 for row in table.rows:
                     for cell in row.cells:
-                        cell_text = cell.text.strip()
-                        if cell_text:
-                            text += cell_text + " "
-                text += "\n"
+                        cell_text = cell.text
+                        if cell_text and not cell_text.isspace():
+                            append(cell_text)
+                            append(" ")
+                append("\n")
             
-            return text
+            return "".join(parts)
         except Exception as e:
             logger.error(f"Error extracting text from DOCX: {e}")
             raise Exception(f"Failed to extract text from DOCX: {str(e)}")
@@ -129,6 +166,8 @@ class DocumentProcessor:
         """
         Split text into chunks with intelligent boundary detection.
         Uses character-based chunking with configurable size to avoid splitting mid-word/sentence.
+        The configured overlap is an upper bound: when fewer characters of overlap
+        still cover the text with the minimum number of chunks, that is used instead.
         
         Args:
             text: Text to chunk
@@ -141,14 +180,16 @@ class DocumentProcessor:
             metadata = {}
         
         # Clean text minimally - just normalize whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WS_RE.sub(' ', text).strip()
         
-        # Use configured character-based chunk size
+        # Use configured character-based chunk size; bind everything the
+        # loop touches to locals to keep attribute lookups out of it
         target_chunk_size = self.max_chunk_chars
         overlap_size = self.char_overlap
+        text_len = len(text)
         
         # If text is small, return as single chunk
-        if len(text) <= target_chunk_size:
+        if text_len <= target_chunk_size:
             return [{
                 "text": text,
                 "metadata": {
@@ -156,53 +197,57 @@ class DocumentProcessor:
                     "chunk_index": 0, 
                     "total_chunks": 1,
                     "start_char": 0,
-                    "end_char": len(text),
-                    "char_count": len(text)
+                    "end_char": text_len,
+                    "char_count": text_len
                 }
             }]
         
+        # Seamless packing: n + 1 full-size chunks always cover the text, so
+        # when doing that needs no more overlap than configured, spread the
+        # slack evenly instead of leaving a short, mostly repeated tail chunk
+        n = text_len // target_chunk_size
+        packed_overlap = math.ceil(((n + 1) * target_chunk_size - text_len) / n)
+        if packed_overlap < overlap_size:
+            overlap_size = packed_overlap
+        
         chunks = []
+        append = chunks.append
+        rfind = text.rfind
+        overlap_search = _OVERLAP_BREAK_RE.search
         chunk_index = 0
         start_pos = 0
+        last_start = -1
         
-        while start_pos < len(text):
+        while start_pos < text_len:
             # Calculate end position
             end_pos = start_pos + target_chunk_size
             
             # If this is the last chunk, just take the rest
-            if end_pos >= len(text):
+            if end_pos >= text_len:
                 chunk_text = text[start_pos:]
-                chunks.append({
+                append({
                     "text": chunk_text,
                     "metadata": {
                         **metadata,
                         "chunk_index": chunk_index,
                         "start_char": start_pos,
-                        "end_char": len(text),
+                        "end_char": text_len,
                         "char_count": len(chunk_text)
                     }
                 })
                 break
             
-            # Find a good break point near end_pos to avoid splitting mid-word
-            # Look for punctuation or whitespace within 50 chars before end_pos
-            search_start = max(start_pos, end_pos - 50)
-            
-            # Chinese and English punctuation marks that indicate good break points
-            break_chars = '。！？；.!?;\n '
-            
-            # Search backwards from end_pos for a good break point
-            best_break = end_pos
-            for i in range(end_pos - 1, search_start - 1, -1):
-                if text[i] in break_chars:
-                    best_break = i + 1  # Break after the punctuation/space
-                    break
+            # Find a good break point near end_pos to avoid splitting mid-word:
+            # the last punctuation or whitespace within the search window
+            search_start = max(start_pos, end_pos - _BREAK_SEARCH_WINDOW)
+            last_break = max(rfind(c, search_start, end_pos) for c in _BREAK_CHARS)
+            best_break = last_break + 1 if last_break >= 0 else end_pos
             
             # Extract chunk
             chunk_text = text[start_pos:best_break].strip()
             
             if chunk_text:  # Only add non-empty chunks
-                chunks.append({
+                append({
                     "text": chunk_text,
                     "metadata": {
                         **metadata,
@@ -213,27 +258,19 @@ class DocumentProcessor:
                     }
                 })
                 chunk_index += 1
+                last_start = start_pos
             
-            # Move to next chunk with overlap
-            # Calculate target overlap position
+            # Move to next chunk with overlap, starting after the first
+            # space or punctuation within the window (avoid mid-word)
             target_overlap_start = best_break - overlap_size
-            
-            # Find a good break point for the overlap start (avoid mid-word)
-            # Search forward from target position to find a space or punctuation
-            overlap_break_chars = ' \n。！？；.!?;'
-            overlap_start = target_overlap_start
-            
-            # Search within 50 chars forward to find a good start point
-            search_end = min(target_overlap_start + 50, best_break)
-            for i in range(target_overlap_start, search_end):
-                if text[i] in overlap_break_chars:
-                    overlap_start = i + 1  # Start after the break char
-                    break
+            search_end = min(target_overlap_start + _BREAK_SEARCH_WINDOW, best_break)
+            match = overlap_search(text, target_overlap_start, search_end)
+            overlap_start = match.end() if match else target_overlap_start
             
             start_pos = overlap_start
             
             # Make sure we don't go backwards or stay at the same position
-            if start_pos <= chunks[-1]["metadata"]["start_char"]:
+            if start_pos <= last_start:
                 start_pos = best_break
         
         # Update total_chunks in all metadata
@@ -244,12 +281,13 @@ class DocumentProcessor:
         return chunks
     
     
-    def process_file(self, file_content: bytes, filename: str, file_type: str) -> List[Dict[str, Any]]:
+    def process_file(self, file_content: Union[bytes, BinaryIO], filename: str, file_type: str) -> List[Dict[str, Any]]:
         """
         Process a file and return text chunks with metadata.
         
         Args:
-            file_content: File content as bytes
+            file_content: File content as bytes, or an open binary file so
+                PDF/DOCX parsing reads from disk instead of a full in-memory copy
             filename: Original filename
             file_type: File type ('pdf', 'txt', or 'docx')
             
@@ -267,14 +305,14 @@ class DocumentProcessor:
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
             
-            if not text.strip():
+            if not text or text.isspace():
                 raise ValueError("No text content found in file")
             
             # Create base metadata
             base_metadata = {
                 "filename": filename,
                 "file_type": file_type,
-                "file_size": len(file_content),
+                "file_size": self._content_size(file_content),
                 "text_length": len(text)
             }
             
@@ -1,15 +1,25 @@
 """
 Embedding Provider - Unified interface for local and external embeddings.
 Supports SentenceTransformer (local) and OpenAI-compatible APIs (external).
-Uses async httpx for external API calls.
+Uses a pooled httpx client for external API calls, sending sub-batches concurrently.
 """
 
+import os
 import httpx
+import orjson
+import base64
+import hashlib
 import logging
 import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger('histfig')
-from typing import List, Union
+from typing import List, Optional, Union
+import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 
@@ -19,8 +29,159 @@ from config import (
     EXTERNAL_EMBEDDING_MODEL,
     EMBEDDING_API_URL,
     EMBEDDING_API_KEY,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CPU_THREADS,
+    EMBEDDING_CPU_PROCESSES,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ATTN_IMPLEMENTATION,
+    EMBEDDING_COMPILE,
+    EMBEDDING_MAX_SEQ_LENGTH,
+    EMBEDDING_FP16,
+    EMBEDDING_HALF_DTYPE,
+    EMBEDDING_API_BATCH_SIZE,
+    EMBEDDING_API_CONCURRENCY,
+    EMBEDDING_API_ENCODING_FORMAT,
+    EMBEDDING_CACHE_CAPACITY,
+    EMBEDDING_QUERY_CACHE_CAPACITY,
+    EMBEDDING_DISK_CACHE,
+    EMBEDDING_DISK_CACHE_PATH,
+    EMBEDDING_DISK_CACHE_MAX_ROWS,
+    EMBEDDING_WARMUP_EXTERNAL,
 )
 
+# Below this many texts, starting work in the process pool costs more than it saves
+_MULTI_PROCESS_MIN_TEXTS = 256
+
+# Seconds a warmup request to the external API may take before it is abandoned
+_EXTERNAL_WARMUP_TIMEOUT = 5.0
+
+
+class _EmbeddingLRU:
+    """Thread-safe LRU cache of embedding vectors keyed by content hash."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: bytes, vector: np.ndarray):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            if len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class _EmbeddingDiskCache:
+    """Persistent content-hash -> float32 vector store backed by SQLite.
+
+    Rows record when they were last stored or read; beyond max_rows the least
+    recently used are deleted (0 = unbounded).
+    """
+
+    def __init__(self, path: str, max_rows: int = 0):
+        self.path = path
+        self.max_rows = max_rows
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use; disable the cache if that fails."""
+        if self._conn is None and not self._disabled:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings "
+                    "(key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL DEFAULT 0)"
+                )
+                # Caches created before pruning lack the column; their rows are pruned first
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}
+                if "last_used" not in columns:
+                    conn.execute("ALTER TABLE embeddings ADD COLUMN last_used INTEGER NOT NULL DEFAULT 0")
+                conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache unavailable at {self.path}: {e}")
+                self._disabled = True
+        return self._conn
+
+    def get_many(self, keys: List[bytes]) -> dict:
+        """Return {key: vector} for the keys present on disk."""
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return found
+            try:
+                # Stay well under SQLite's bound-parameter limit
+                for start in range(0, len(keys), 500):
+                    group = keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(group))})",
+                        group,
+                    )
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                if found and self.max_rows > 0:
+                    with conn:
+                        now = int(time.time())
+                        conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                         [(now, key) for key in found])
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache read failed: {e}")
+        return found
+
+    def put_many(self, items: List[tuple]):
+        """Store (key, vector) pairs in a single transaction, then prune beyond max_rows."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    now = int(time.time())
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                        [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items],
+                    )
+                    if self.max_rows > 0:
+                        excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_rows
+                        if excess > 0:
+                            conn.execute(
+                                "DELETE FROM embeddings WHERE key IN "
+                                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                                (excess,),
+                            )
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache write failed: {e}")
+
 
 class EmbeddingProvider:
     """Unified embedding provider supporting local and external sources."""
@@ -41,6 +202,32 @@ class EmbeddingProvider:
 
         self.encoder = None
         self.device = None
+        self.batch_size = None
+        self._warmed_up = False
+        # Every local model call runs on this one thread, so concurrent callers
+        # (request threads, uploads) queue in order instead of contending for the model
+        self._encode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        # SentenceTransformer multi-process pool for large CPU encodes (started on first use)
+        self._process_pool = None
+
+        # Recently computed embeddings, so repeated queries and re-uploads skip the encoder.
+        # Queries get their own small cache so a bulk upload cannot evict them
+        self._cache = _EmbeddingLRU(EMBEDDING_CACHE_CAPACITY)
+        self._query_cache = _EmbeddingLRU(EMBEDDING_QUERY_CACHE_CAPACITY)
+        # Survives restarts, so CLI re-uploads in a fresh process also skip the encoder.
+        # Only document embeddings go here; one-off queries would just fill it
+        self._disk_cache = (
+            _EmbeddingDiskCache(EMBEDDING_DISK_CACHE_PATH, EMBEDDING_DISK_CACHE_MAX_ROWS)
+            if EMBEDDING_DISK_CACHE else None
+        )
+
+        # Long-lived HTTP clients for the external API, created on first use so
+        # repeated calls reuse pooled keep-alive connections
+        self._client: Optional[httpx.Client] = None
+        # Sends the sub-batch requests of one encode concurrently, at most
+        # EMBEDDING_API_CONCURRENCY at a time (threads start on first use)
+        self._api_executor = ThreadPoolExecutor(max_workers=max(1, EMBEDDING_API_CONCURRENCY),
+                                                thread_name_prefix="embed-api")
 
         if self.source == "local":
             self._init_local()
@@ -54,11 +241,87 @@ class EmbeddingProvider:
         else:
             self.device = "cpu"
 
-        self.encoder = SentenceTransformer(self.local_model_name, device=self.device)
+        # encode() sorts inputs by length before batching, so each batch is only
+        # padded to its own longest text; smaller batches waste less on padding,
+        # which matters on CPU where there is no parallelism to amortize it
+        self.batch_size = EMBEDDING_BATCH_SIZE or (8 if self.device == "cpu" else 32)
+
+        self.encoder = self._load_encoder()
+        if EMBEDDING_MAX_SEQ_LENGTH > 0:
+            # Long-context models default to many thousands of tokens; a cap near
+            # the longest chunk bounds the padded length of every batch
+            self.encoder.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+        if self.device == "cpu":
+            # fp16 is slower on CPU; instead cap torch's thread pools, since
+            # oversubscribing cores slows the forward pass down
+            self._set_cpu_threads()
+        elif EMBEDDING_FP16 and EMBEDDING_BACKEND == "torch":
+            # Halves memory traffic per forward pass at a negligible quality cost
+            self.encoder = self.encoder.to(self._half_dtype())
+        if not getattr(self.encoder.tokenizer, "is_fast", False):
+            # encode() tokenizes each batch in one call, which only runs in parallel
+            # native code with a Rust-backed tokenizer
+            logger.warning(f"{self.local_model_name} has no fast tokenizer; tokenization will be slow "
+                           f"(install the 'tokenizers' package or use a model that ships tokenizer.json)")
+        if EMBEDDING_COMPILE and EMBEDDING_BACKEND == "torch":
+            self._compile_encoder()
         logger.info(f"Loaded local embedding model: {self.local_model_name} on {self.device}")
 
-    def _encode_local_sync(self, text: Union[str, List[str]], is_query: bool = False) -> Union[List[float], List[List[float]]]:
-        """Synchronous local encoding - called via asyncio.to_thread."""
+    def _half_dtype(self) -> torch.dtype:
+        """Half-precision dtype for the local model; bfloat16 only where the GPU supports it."""
+        if EMBEDDING_HALF_DTYPE == "bfloat16":
+            if self.device == "cuda" and torch.cuda.is_bf16_supported():
+                return torch.bfloat16
+            logger.warning(f"bfloat16 is not supported on {self.device}; using float16")
+        return torch.float16
+
+    def _compile_encoder(self):
+        """torch.compile the transformer forward, paying the compile cost up front."""
+        auto_model = self.encoder[0].auto_model
+        original_forward = auto_model.forward
+        try:
+            auto_model.forward = torch.compile(original_forward, dynamic=True)
+            # Trigger compilation now so the first real request doesn't wait for it
+            with torch.inference_mode():
+                self.encoder.encode("warmup", show_progress_bar=False)
+            logger.info("Compiled local embedding model with torch.compile")
+        except Exception as e:
+            auto_model.forward = original_forward
+            logger.warning(f"torch.compile failed, using eager mode: {e}")
+
+    @staticmethod
+    def _set_cpu_threads():
+        """Size torch's intra-op and inter-op thread pools for CPU encoding."""
+        threads = EMBEDDING_CPU_THREADS or min(8, os.cpu_count() or 4)
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(max(1, threads // 2))
+        except RuntimeError:
+            # Can only be set before torch starts any inter-op work
+            pass
+
+    def _load_encoder(self) -> SentenceTransformer:
+        """Load the local model with the configured runtime, falling back to torch."""
+        if EMBEDDING_BACKEND != "torch":
+            try:
+                # ONNX Runtime / OpenVINO run fused graph kernels, several times faster on CPU
+                return SentenceTransformer(self.local_model_name, device=self.device, backend=EMBEDDING_BACKEND)
+            except Exception as e:
+                logger.warning(f"Could not load {self.local_model_name} with {EMBEDDING_BACKEND} backend, using torch: {e}")
+        elif EMBEDDING_ATTN_IMPLEMENTATION:
+            model_kwargs = {"attn_implementation": EMBEDDING_ATTN_IMPLEMENTATION}
+            if EMBEDDING_ATTN_IMPLEMENTATION == "flash_attention_2":
+                # FlashAttention unpads each batch and runs variable-length kernels; it requires half precision
+                model_kwargs["torch_dtype"] = torch.float16
+            try:
+                return SentenceTransformer(self.local_model_name, device=self.device, model_kwargs=model_kwargs)
+            except Exception as e:
+                logger.warning(f"Could not load {self.local_model_name} with {EMBEDDING_ATTN_IMPLEMENTATION} attention, using default: {e}")
+        return SentenceTransformer(self.local_model_name, device=self.device)
+
+    def _encode_local_sync(self, text: Union[str, List[str]], is_query: bool = False,
+                           batch_size: int = None) -> np.ndarray:
+        """Synchronous local encoding - called on the encode executor thread."""
         if self.encoder is None:
             self._init_local()
 
@@ -70,108 +333,252 @@ class EmbeddingProvider:
             else:
                 text = [f"query: {t}" for t in text]
 
-        result = self.encoder.encode(text)
-        return result.tolist()
+        if (self.device == "cpu" and EMBEDDING_CPU_PROCESSES > 1
+                and not isinstance(text, str) and len(text) >= _MULTI_PROCESS_MIN_TEXTS):
+            # Bulk uploads: spread batches over worker processes, one model copy each
+            embeddings = self.encoder.encode_multi_process(
+                text,
+                self._get_process_pool(),
+                batch_size=batch_size or self.batch_size,
+                normalize_embeddings=True,
+            )
+            return embeddings.astype(np.float32, copy=False)
+
+        with torch.inference_mode():
+            embeddings = self.encoder.encode(
+                text,
+                batch_size=batch_size or self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        # Half-precision models return float16; keep one dtype for the cache and Chroma
+        return embeddings.astype(np.float32, copy=False)
+
+    def warmup(self):
+        """Pay one-time startup costs (weights to device, kernel selection, TLS handshake) up front.
+        
+        For an external API this is a real, billed request, so it is only sent
+        when EMBEDDING_WARMUP_EXTERNAL is enabled.
+        """
+        if self._warmed_up:
+            return
+        self._warmed_up = True
+        if self.source != "local" and not EMBEDDING_WARMUP_EXTERNAL:
+            return
+        try:
+            if self.source == "local":
+                # Bypasses the caches so the model really runs, but queues like any other encode
+                self._encode_executor.submit(self._encode_local_sync, ["warmup"] * 2, False, 2).result()
+            else:
+                # Best effort: only opens the pooled connection, and a slow API can't stall startup
+                self._get_client().post(
+                    f"{self.api_url}/embeddings",
+                    content=self._request_body(["warmup"]),
+                    timeout=_EXTERNAL_WARMUP_TIMEOUT,
+                )
+        except Exception as e:
+            logger.warning(f"Embedding warmup failed: {e}")
 
-    async def encode_document(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Encode document text for storage/indexing."""
-        if self.source == "local":
-            return await asyncio.to_thread(self._encode_local_sync, text, False)
-        return await self._encode_external(text)
+    async def encode_document(self, text: Union[str, List[str]], batch_size: int = None) -> Union[List[float], List[List[float]]]:
+        """Encode document text for storage/indexing. Pass a list to encode a whole batch at once."""
+        return await asyncio.to_thread(self._encode_sync, text, False, batch_size)
 
     async def encode_query(self, text: str) -> List[float]:
         """Encode query text for search."""
-        if self.source == "local":
-            return await asyncio.to_thread(self._encode_local_sync, text, True)
-        return await self._encode_external(text)
+        return await asyncio.to_thread(self._encode_sync, text, True)
 
     # Synchronous versions for backward compatibility (used by figure_manager)
-    def encode_document_sync(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Synchronous encode document text for storage/indexing."""
-        if self.source == "local":
-            return self._encode_local_sync(text, is_query=False)
-        return self._encode_external_sync(text)
-
-    def encode_query_sync(self, text: str) -> List[float]:
-        """Synchronous encode query text for search."""
-        if self.source == "local":
-            return self._encode_local_sync(text, is_query=True)
-        return self._encode_external_sync(text)
-
-    def _encode_external_sync(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Synchronous encode using external OpenAI-compatible API."""
-        if isinstance(text, str):
-            input_data = [text]
-            single_input = True
-        else:
-            input_data = text
-            single_input = False
-
+    def encode_document_sync(self, text: Union[str, List[str]], batch_size: int = None,
+                             as_numpy: bool = False) -> Union[List[float], List[List[float]], np.ndarray]:
+        """Synchronous encode document text for storage/indexing. Pass a list to encode a whole batch at once.
+        
+        With as_numpy=True the float32 array is returned as-is (ChromaDB accepts it directly).
+        """
+        return self._encode_sync(text, False, batch_size, as_numpy)
+
+    def encode_query_sync(self, text: Union[str, List[str]],
+                          as_numpy: bool = False) -> Union[List[float], List[List[float]], np.ndarray]:
+        """Synchronous encode query text for search. Pass a list to encode several queries at once."""
+        return self._encode_sync(text, True, None, as_numpy)
+
+    def _encode_sync(self, text: Union[str, List[str]], is_query: bool,
+                     batch_size: int = None, as_numpy: bool = False) -> Union[List[float], List[List[float]], np.ndarray]:
+        """Encode via the cache, computing only the texts not seen before."""
+        texts = [text] if isinstance(text, str) else list(text)
+        keys, vectors, missing = self._lookup_cached(texts, is_query)
+
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+            if self.source == "local":
+                computed = self._encode_executor.submit(
+                    self._encode_local_sync, miss_texts, is_query, batch_size).result()
+            else:
+                computed = self._encode_external_sync(miss_texts)
+            self._store_computed(keys, vectors, missing, computed, is_query)
+
+        if as_numpy:
+            return vectors[0] if isinstance(text, str) else self._stack(vectors)
+        return self._to_lists(vectors, isinstance(text, str))
+
+    def _cache_key(self, text: str, is_query: bool) -> bytes:
+        """Cache key for a text: hash of format version, source, model, query flag, and content."""
+        model = self.local_model_name if self.source == "local" else self.external_model
+        if self.source == "local" and EMBEDDING_MAX_SEQ_LENGTH > 0:
+            # Truncation changes vectors for long texts
+            model = f"{model}@{EMBEDDING_MAX_SEQ_LENGTH}"
+        # "n1": vectors are L2-normalized; bump if the stored vector format changes
+        raw = f"n1\0{self.source}\0{model}\0{int(is_query)}\0{text}".encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=16).digest()
+
+    def _lookup_cached(self, texts: List[str], is_query: bool):
+        """Return (keys, vectors, missing): cached vectors (None on miss) and the miss indices."""
+        cache = self._query_cache if is_query else self._cache
+        keys = [self._cache_key(t, is_query) for t in texts]
+        vectors = [cache.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+
+        if missing and self._disk_cache is not None and not is_query:
+            stored = self._disk_cache.get_many([keys[i] for i in missing])
+            if stored:
+                still_missing = []
+                for i in missing:
+                    vector = stored.get(keys[i])
+                    if vector is None:
+                        still_missing.append(i)
+                    else:
+                        vectors[i] = vector
+                        cache.put(keys[i], vector)
+                missing = still_missing
+
+        return keys, vectors, missing
+
+    def _store_computed(self, keys: List[bytes], vectors: List[Optional[np.ndarray]],
+                        missing: List[int], computed: np.ndarray, is_query: bool):
+        """Place freshly computed vectors into their slots and cache them."""
+        cache = self._query_cache if is_query else self._cache
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            cache.put(keys[i], vector)
+        if self._disk_cache is not None and not is_query:
+            self._disk_cache.put_many([(keys[i], vectors[i]) for i in missing])
+
+    @staticmethod
+    def _stack(vectors: List[np.ndarray]) -> np.ndarray:
+        """Stack vectors into one 2-D float32 array."""
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    @classmethod
+    def _to_lists(cls, vectors: List[np.ndarray], single_input: bool) -> Union[List[float], List[List[float]]]:
+        """Convert vectors to plain Python lists at the API boundary."""
+        if single_input:
+            return vectors[0].tolist()
+        return cls._stack(vectors).tolist() if vectors else []
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters and sizes of the document and query embedding caches."""
+        return {"documents": self._cache.stats(), "queries": self._query_cache.stats()}
+
+    def _api_headers(self) -> dict:
+        """Headers sent with every external embedding API request."""
         headers = {"Content-Type": "application/json"}
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
-
+        return headers
+
+    def _get_client(self) -> httpx.Client:
+        """Get the shared sync HTTP client (lazily created)."""
+        if self._client is None:
+            self._client = httpx.Client(
+                timeout=30.0,
+                headers=self._api_headers(),
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            )
+        return self._client
+
+    def _get_process_pool(self):
+        """Get the multi-process encode pool (lazily started)."""
+        if self._process_pool is None:
+            self._process_pool = self.encoder.start_multi_process_pool(["cpu"] * EMBEDDING_CPU_PROCESSES)
+            logger.info(f"Started {EMBEDDING_CPU_PROCESSES} embedding worker processes")
+        return self._process_pool
+
+    def close(self):
+        """Release the encode and API threads, worker processes, and HTTP client. Call on application shutdown."""
+        self._encode_executor.shutdown(wait=False)
+        self._api_executor.shutdown(wait=False)
+        if self._process_pool is not None:
+            SentenceTransformer.stop_multi_process_pool(self._process_pool)
+            self._process_pool = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _encode_external_sync(self, input_data: List[str]) -> np.ndarray:
+        """Synchronous encode using external OpenAI-compatible API."""
         try:
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    f"{self.api_url}/embeddings",
-                    headers=headers,
-                    json={"model": self.external_model, "input": input_data},
-                )
-
-                if response.status_code != 200:
-                    error_msg = self._parse_error(response)
-                    logger.error(f"Embedding API error: {error_msg}")
-                    raise RuntimeError(f"Embedding API error: {error_msg}")
-
-                data = response.json()
-                embeddings = [item["embedding"] for item in sorted(data["data"], key=lambda x: x["index"])]
-
-                return embeddings[0] if single_input else embeddings
+            client = self._get_client()
+            # One POST per group so large uploads stay within API batch limits; several
+            # groups are sent concurrently over the pooled client, and map() keeps input order
+            groups = [input_data[start:start + EMBEDDING_API_BATCH_SIZE]
+                      for start in range(0, len(input_data), EMBEDDING_API_BATCH_SIZE)]
+            if len(groups) == 1:
+                results = [self._post_embeddings(client, groups[0])]
+            else:
+                results = list(self._api_executor.map(lambda group: self._post_embeddings(client, group), groups))
+            return self._l2_normalize(np.asarray([vector for group in results for vector in group], dtype=np.float32))
 
         except httpx.RequestError as e:
             logger.error(f"Embedding API request failed: {e}")
             raise RuntimeError(f"Embedding API request failed: {e}")
 
-    async def _encode_external(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Encode using external OpenAI-compatible API."""
-        if isinstance(text, str):
-            input_data = [text]
-            single_input = True
-        else:
-            input_data = text
-            single_input = False
-
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.api_url}/embeddings",
-                    headers=headers,
-                    json={"model": self.external_model, "input": input_data},
-                )
-
-                if response.status_code != 200:
-                    error_msg = self._parse_error(response)
-                    logger.error(f"Embedding API error: {error_msg}")
-                    raise RuntimeError(f"Embedding API error: {error_msg}")
-
-                data = response.json()
-                embeddings = [item["embedding"] for item in sorted(data["data"], key=lambda x: x["index"])]
-
-                return embeddings[0] if single_input else embeddings
-
-        except httpx.RequestError as e:
-            logger.error(f"Embedding API request failed: {e}")
-            raise RuntimeError(f"Embedding API request failed: {e}")
+    def _post_embeddings(self, client: httpx.Client, texts: List[str]) -> List[np.ndarray]:
+        """Send one embeddings request and return its vectors."""
+        response = client.post(f"{self.api_url}/embeddings", content=self._request_body(texts))
+        return self._parse_embeddings(response)
+
+    @staticmethod
+    def _l2_normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Scale rows to unit length so cosine similarity is a plain inner product."""
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _request_body(self, texts: List[str]) -> bytes:
+        """Serialized JSON body for one embeddings request."""
+        body = {"model": self.external_model, "input": texts}
+        # base64-packed float32 is ~4x smaller on the wire than a JSON float list
+        if EMBEDDING_API_ENCODING_FORMAT and EMBEDDING_API_ENCODING_FORMAT != "float":
+            body["encoding_format"] = EMBEDDING_API_ENCODING_FORMAT
+        return orjson.dumps(body)
+
+    def _parse_embeddings(self, response: httpx.Response) -> List[np.ndarray]:
+        """Check an embeddings response and return its vectors in input order."""
+        if response.status_code != 200:
+            error_msg = self._parse_error(response)
+            logger.error(f"Embedding API error: {error_msg}")
+            raise RuntimeError(f"Embedding API error: {error_msg}")
+
+        # orjson parses large batched responses several times faster than stdlib json
+        items = orjson.loads(response.content)["data"]
+        # Place each vector at its index in one pass rather than sorting
+        embeddings = [None] * len(items)
+        for item in items:
+            embeddings[item["index"]] = self._decode_embedding(item["embedding"])
+        return embeddings
+
+    @staticmethod
+    def _decode_embedding(embedding: Union[str, List[float]]) -> np.ndarray:
+        """Decode one embedding; servers that ignore encoding_format still return a float list."""
+        if isinstance(embedding, str):
+            return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+        return np.asarray(embedding, dtype=np.float32)
 
     def _parse_error(self, response: httpx.Response) -> str:
         """Parse error response."""
         try:
-            error_data = response.json()
+            error_data = orjson.loads(response.content)
             if "error" in error_data:
                 err = error_data["error"]
                 return err.get("message", str(err)) if isinstance(err, dict) else str(err)
@@ -4,27 +4,105 @@ Handles CRUD operations for historical figures and their document collections.
 Provides async wrappers for ChromaDB operations using asyncio.to_thread.
 """
 
-import json
+import copy
+import io
+import os
+import orjson
 import shutil
-import pickle
+import tempfile
 import asyncio
+import threading
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from pathlib import Path
 
 logger = logging.getLogger('histfig')
 import chromadb
 from chromadb.config import Settings
+from chromadb.errors import NotFoundError
 import re
 import numpy as np
 from rank_bm25 import BM25Okapi
 from config import MIN_COSINE_SIMILARITY, SEARCH_MULTIPLIER, MAX_SEARCH_RESULTS, RRF_K, FIGURES_DIR, CHROMA_DB_PATH
+from config import FUSION_METHOD, FUSION_ALPHA, EMBEDDING_WARMUP
+from config import HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, MAX_BM25_CACHED_FIGURES, SEARCH_RESULT_CACHE_SIZE
 from text_processor import text_processor
-from search_utils import reciprocal_rank_fusion
+from search_utils import reciprocal_rank_fusion, combsum_fusion, SparseBM25
 from embedding_provider import get_embedding_provider
 
+# Figure IDs: letters, underscores and hyphens only (\Z, unlike $, rejects a trailing newline)
+_FIGURE_ID_RE = re.compile(r'^[a-zA-Z_-]+\Z')
+# Characters not allowed in figure display names
+_INVALID_NAME_CHARS = frozenset('#$%^&*+=\\|`~@')
+
+# Documents embedded and written per ChromaDB add when adding in bulk
+_ADD_BATCH_SIZE = 256
+
+# Bump when the on-disk BM25 layout changes; files in other versions are rebuilt
+_BM25_FORMAT_VERSION = 3
+
+# Above this many figure directories, index rebuilds read metadata files on a thread pool
+_PARALLEL_INDEX_MIN_FIGURES = 16
+
+# Matching words reported per BM25 hit
+_MAX_MATCHING_WORDS = 5
+
+# Maximum length of a figure's description and personality prompt
+_MAX_FIELD_CHARS = 400
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Write data to path through a uniquely named temp file in the same directory.
+    
+    Concurrent writers each get their own temp file, and the rename means
+    readers only ever see a complete file. fsync is left to the caller.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                # os.write may write fewer bytes than asked without raising
+                view = view[os.write(fd, view):]
+            os.fchmod(fd, 0o644)
+        finally:
+            os.close(fd)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _clamp(s: Optional[str], n: int) -> str:
+    """Truncate s to n characters, returning it unchanged (no copy) when it already fits."""
+    return s if s is not None and len(s) <= n else (s or "")[:n]
+
+
+@lru_cache(maxsize=65536)
+def _display_term(term: str) -> Optional[str]:
+    """Display form of a BM25 term (n-grams joined with spaces), or None for a stopword
+    or an n-gram containing one.
+
+    Depends only on the term and the static stopword set, so results are
+    shared across figures and never go stale.
+    """
+    # Stopwords are lowercased; isdisjoint checks n-gram parts in C
+    if '_' in term:
+        if not text_processor.stopwords.isdisjoint(term.lower().split('_')):
+            return None
+        return term.replace('_', ' ')
+    if term.lower() in text_processor.stopwords:
+        return None
+    return term
 
 class FigureManager:
     def __init__(self, figures_dir: str = "./figures", db_path: str = "./chroma_db"):
@@ -43,9 +121,71 @@ class FigureManager:
         
         self.embedding_provider = get_embedding_provider()
         
-        self.bm25_cache = {}
+        # BM25 caches are bounded: bm25_cache keeps least-recently-used order and
+        # evicting a figure drops its entries from all of them (files stay on disk)
+        self.bm25_cache: "OrderedDict[str, BM25Okapi]" = OrderedDict()
+        self._bm25_lru_lock = threading.Lock()
+        # Per-figure locks so concurrent searches load or build a figure's index once
+        self._bm25_load_locks: Dict[str, threading.Lock] = {}
         self.bm25_documents_cache = {}
         self.bm25_metadata_cache = {}
+        # Chunk texts aligned with the metadata lists, so BM25 hits need no ChromaDB lookup
+        self.bm25_texts_cache: Dict[str, List[str]] = {}
+        # Postings built from each cached BM25 index, used for scoring
+        self.bm25_sparse_cache: Dict[str, SparseBM25] = {}
+        
+        # Recent hybrid search results as JSON bytes (parsed per hit, so callers can't alter
+        # them), keyed by (figure_id, generation, stamp, query, n_results, min_cosine_similarity).
+        # Changing a figure's documents bumps its generation, so older entries are never hit
+        # again (even ones stored by a search already running); the stamp (see
+        # _search_cache_stamp) catches changes made by other processes
+        self._search_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._search_generations: Dict[str, int] = {}
+        self._search_cache_lock = threading.Lock()
+        
+        # Per-figure document counts, seeded from collection.count() on first use and
+        # kept current by this process's adds/clears, so each add skips the SQL COUNT
+        # when updating metadata. sync_document_count re-counts (other processes add too)
+        self._doc_counts: Dict[str, int] = {}
+        self._doc_counts_lock = threading.Lock()
+        
+        # Single writer thread for ChromaDB adds, so bulk loads write one batch
+        # while the next is being encoded
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer")
+        
+        # Loads a cold BM25 index while the search's query embedding is computed
+        self._bm25_loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bm25-loader")
+        
+        # ChromaDB collection handles by figure_id, so add/search skip the lookup by name
+        self._collections: Dict[str, Any] = {}
+        
+        # Figures whose collection this process dropped in a clear and has not recreated;
+        # only used to skip a redundant delete (get_figure_collection recreates regardless)
+        self._pending_empty_collections: set = set()
+        
+        # Metadata fields changed by bulk operations, written out by flush()
+        self._pending_metadata: Dict[str, Dict[str, Any]] = {}
+        # Guards _pending_metadata and _unsynced_files, which request threads, the
+        # writer thread and flush() all touch; file I/O happens outside it
+        self._pending_lock = threading.Lock()
+        # Serializes flushes, so two of them can't write one figure's fields out of order
+        self._flush_lock = threading.Lock()
+        
+        # Raw metadata.json bytes per figure with the file's st_mtime_ns; reused until the file changes
+        self._metadata_cache: Dict[str, tuple] = {}
+        
+        # metadata.json files replaced since the last flush(), fsynced there
+        self._unsynced_files: set = set()
+        
+        # figure_id -> metadata for every figure, mirrored to figures/_index.json
+        # so listing figures is one file read instead of a scan of every figure
+        self._index_path = self.figures_dir / "_index.json"
+        self._figure_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._figure_index_mtime_ns: Optional[int] = None
+        # Index entries changed by this process (None = removed) since the last flush();
+        # applied to the in-memory index at once and to _index.json by flush()
+        self._index_changes: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._index_lock = threading.RLock()
         
         # Per-figure read-write locks for BM25 cache protection
         # Allows multiple concurrent readers, but writers get exclusive access
@@ -111,8 +251,270 @@ class FigureManager:
         """Generate a unique document ID using UUID."""
         return f"{figure_id}_{uuid.uuid4().hex[:12]}"
     
+    def _document_count(self, figure_id: str, collection) -> int:
+        """Get the document count for a figure, counting the collection only once."""
+        count = self._doc_counts.get(figure_id)
+        if count is None:
+            count = self._call_collection(figure_id, collection, "count")
+            with self._doc_counts_lock:
+                count = self._doc_counts.setdefault(figure_id, count)
+        return count
+    
+    def _read_metadata_file(self, figure_id: str) -> Optional[Dict[str, Any]]:
+        """Read a figure's metadata.json, reusing its bytes while the file is unchanged.
+        
+        Returns a freshly parsed dict (callers mutate it), or None if the file does not exist.
+        """
+        metadata_file = self.figures_dir / figure_id / "metadata.json"
+        try:
+            mtime_ns = metadata_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._metadata_cache.pop(figure_id, None)
+            return None
+        
+        cached = self._metadata_cache.get(figure_id)
+        if cached is None or cached[0] != mtime_ns:
+            with open(metadata_file, 'rb') as f:
+                cached = (mtime_ns, f.read())
+            self._metadata_cache[figure_id] = cached
+        # Parsing the cached bytes is cheaper than deep-copying a parsed dict
+        return orjson.loads(cached[1])
+    
+    def _write_metadata_file(self, figure_id: str, metadata: Dict[str, Any]):
+        """Write a figure's metadata.json and refresh the cached copy.
+        
+        The file is written to a unique temp file and renamed over the original,
+        so a crash mid-write never leaves a truncated file and concurrent
+        writers don't collide. fsync is deferred to flush().
+        """
+        metadata_file = self.figures_dir / figure_id / "metadata.json"
+        # orjson writes UTF-8 bytes directly (non-ASCII kept as-is, like ensure_ascii=False)
+        data = orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
+        _atomic_write(metadata_file, data)
+        with self._pending_lock:
+            self._unsynced_files.add(metadata_file)
+        self._metadata_cache[figure_id] = (metadata_file.stat().st_mtime_ns, data)
+        # A parsed copy, so the index entry doesn't share nested dicts with the caller
+        self._update_figure_index(figure_id, orjson.loads(data))
+    
+    def _load_figure_index(self) -> Dict[str, Dict[str, Any]]:
+        """Get the figure index, reloading it if another process rewrote it.
+        
+        The index is rebuilt by scanning figure directories when _index.json is
+        missing or unreadable, or when figures_dir changed after the index was
+        last written (a figure directory was added or removed without it).
+        """
+        with self._index_lock:
+            try:
+                index_mtime_ns = self._index_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return self._rebuild_figure_index()
+            
+            if self.figures_dir.stat().st_mtime_ns > index_mtime_ns:
+                return self._rebuild_figure_index()
+            
+            if self._figure_index is None or index_mtime_ns != self._figure_index_mtime_ns:
+                try:
+                    with open(self._index_path, 'rb') as f:
+                        self._figure_index = orjson.loads(f.read())
+                    self._figure_index_mtime_ns = index_mtime_ns
+                except (orjson.JSONDecodeError, OSError) as e:
+                    logger.warning(f"Rebuilding unreadable figure index: {e}")
+                    return self._rebuild_figure_index()
+                # Another process's index doesn't have our unflushed changes yet
+                self._apply_index_changes(self._figure_index)
+            return self._figure_index
+    
+    def _rebuild_figure_index(self) -> Dict[str, Dict[str, Any]]:
+        """Build the figure index by scanning every figure's metadata.json.
+        
+        Directory entries come from os.scandir (no extra stat per entry), and
+        with many figures the files are read on a few threads.
+        """
+        with self._index_lock:
+            with os.scandir(self.figures_dir) as entries:
+                figure_ids = [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+            
+            if len(figure_ids) > _PARALLEL_INDEX_MIN_FIGURES:
+                with ThreadPoolExecutor(max_workers=8, thread_name_prefix="figure-index") as pool:
+                    metadatas = list(pool.map(self._read_index_entry, figure_ids))
+            else:
+                metadatas = [self._read_index_entry(figure_id) for figure_id in figure_ids]
+            
+            index = {
+                figure_id: metadata
+                for figure_id, metadata in zip(figure_ids, metadatas)
+                if metadata is not None
+            }
+            
+            self._save_figure_index(index)
+            # The scan read every metadata.json, so it already has this process's changes
+            self._index_changes.clear()
+            logger.debug(f"Rebuilt figure index: {len(index)} figures")
+            return index
+    
+    def _read_index_entry(self, figure_id: str) -> Optional[Dict[str, Any]]:
+        """Read one figure's metadata for the index, or None if missing or invalid."""
+        try:
+            return self._read_metadata_file(figure_id)
+        except (orjson.JSONDecodeError, FileNotFoundError):
+            logger.warning(f"Invalid metadata file for figure: {figure_id}")
+            return None
+    
+    def _save_figure_index(self, index: Dict[str, Dict[str, Any]]):
+        """Write the figure index to _index.json and remember its mtime."""
+        _atomic_write(self._index_path, orjson.dumps(index))
+        # The temp file and rename bump figures_dir's mtime after the file's own;
+        # touch the index so the staleness check in _load_figure_index still passes
+        os.utime(self._index_path)
+        self._figure_index = index
+        self._figure_index_mtime_ns = self._index_path.stat().st_mtime_ns
+    
+    def _update_figure_index(self, figure_id: str, metadata: Optional[Dict[str, Any]]):
+        """Set (or, with metadata=None, remove) one figure's index entry in memory; flush() writes _index.json."""
+        with self._index_lock:
+            self._index_changes[figure_id] = metadata
+            if self._figure_index is not None:
+                self._apply_index_changes(self._figure_index, {figure_id: metadata})
+    
+    def _apply_index_changes(self, index: Dict[str, Dict[str, Any]],
+                             changes: Optional[Dict[str, Optional[Dict[str, Any]]]] = None):
+        """Apply unflushed index changes (all of them by default) to an index dict."""
+        for figure_id, metadata in (self._index_changes if changes is None else changes).items():
+            if metadata is None:
+                index.pop(figure_id, None)
+            else:
+                index[figure_id] = metadata
+    
+    def _flush_figure_index(self):
+        """Write this process's index changes to _index.json."""
+        try:
+            with self._index_lock:
+                if not self._index_changes:
+                    return
+                # Loading picks up other processes' changes and reapplies ours
+                index = self._load_figure_index()
+                self._save_figure_index(index)
+                self._index_changes.clear()
+        except Exception as e:
+            # The index is only a cache; the next stale check rebuilds it
+            logger.warning(f"Could not write figure index: {e}")
+    
+    def _set_metadata_field(self, figure_id: str, key: str, value: Any, persist: bool = False) -> bool:
+        """Set a metadata field; unless persist is set, the file write is deferred to flush().
+        
+        Returns False only if a persisted write failed.
+        """
+        with self._pending_lock:
+            self._pending_metadata.setdefault(figure_id, {})[key] = value
+        if persist:
+            return self._flush_metadata(figure_id)
+        return True
+    
+    def _flush_metadata(self, figure_id: str, updates: Optional[Dict[str, Any]] = None) -> bool:
+        """Write deferred metadata fields for a figure, then any updates, to its metadata.json.
+        
+        The deferred fields are taken and cleared under _pending_lock; a field set
+        while the file is written stays pending, and if the write fails the taken
+        fields are put back (without overwriting newer values). _flush_lock keeps
+        concurrent flushes from writing older values last.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = self._pending_metadata.pop(figure_id, None)
+            if not pending and not updates:
+                return True
+            
+            try:
+                metadata = self._read_metadata_file(figure_id)
+                if metadata is None:
+                    return False
+            
+                metadata.update(pending or {})
+                metadata.update(updates or {})
+                self._write_metadata_file(figure_id, metadata)
+                return True
+            
+            except Exception as e:
+                logger.error(f"Error flushing metadata for figure {figure_id}: {e}")
+                if pending:
+                    with self._pending_lock:
+                        restored = self._pending_metadata.setdefault(figure_id, {})
+                        for key, value in pending.items():
+                            restored.setdefault(key, value)
+                return False
+    
+    def _pending_fields(self, figure_id: str) -> Dict[str, Any]:
+        """Copy of a figure's deferred metadata fields."""
+        with self._pending_lock:
+            return dict(self._pending_metadata.get(figure_id, {}))
+    
+    def flush(self):
+        """Write all deferred metadata updates to disk. Call after bulk loads and on shutdown."""
+        with self._pending_lock:
+            figure_ids = list(self._pending_metadata)
+        for figure_id in figure_ids:
+            self._flush_metadata(figure_id)
+        self._flush_figure_index()
+        self._sync_files()
+    
+    def _sync_files(self):
+        """fsync metadata files (and their directories, for the rename) written since the last call."""
+        with self._pending_lock:
+            files, self._unsynced_files = self._unsynced_files, set()
+        for path in files:
+            for target in (path, path.parent):
+                try:
+                    fd = os.open(target, os.O_RDONLY)
+                except FileNotFoundError:
+                    # Figure deleted since the write
+                    break
+                try:
+                    os.fsync(fd)
+                except OSError as e:
+                    logger.warning(f"Could not fsync {target}: {e}")
+                finally:
+                    os.close(fd)
+    
+    @staticmethod
+    def _collection_metadata(figure_id: str) -> Dict[str, Any]:
+        """Metadata for a new figure collection.
+        
+        Embeddings are L2-normalized by the provider, so inner product equals
+        cosine similarity without per-vector norms at insert and query time.
+        Chroma's ip distance is 1 - dot, so similarity = 1 - distance holds for
+        both these and older cosine-space collections. HNSW graph parameters
+        are fixed at creation, so configured values only affect new figures.
+        """
+        metadata = {"hnsw:space": "ip", "figure_id": figure_id}
+        if HNSW_M > 0:
+            metadata["hnsw:M"] = HNSW_M
+        if HNSW_CONSTRUCTION_EF > 0:
+            metadata["hnsw:construction_ef"] = HNSW_CONSTRUCTION_EF
+        if HNSW_SEARCH_EF > 0:
+            metadata["hnsw:search_ef"] = HNSW_SEARCH_EF
+        return metadata
+    
+    def close(self):
+        """Flush deferred metadata and release embedding resources. Call before exiting."""
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self._bm25_loader.shutdown(wait=True)
+        self.embedding_provider.close()
+    
     def _get_bm25_paths(self, figure_id: str) -> tuple:
-        """Get BM25 file paths for a figure."""
+        """Get BM25 file paths for a figure: numeric index, postings, token lists, metadata, texts."""
+        base_path = self.bm25_dir / figure_id
+        return (
+            base_path.with_suffix('.bm25.npz'),
+            base_path.with_suffix('.postings.npy'),
+            base_path.with_suffix('.docs.json'),
+            base_path.with_suffix('.meta.json'),
+            base_path.with_suffix('.texts.json')
+        )
+    
+    def _get_legacy_bm25_paths(self, figure_id: str) -> tuple:
+        """Pickle files written by older versions; never loaded, only removed."""
         base_path = self.bm25_dir / figure_id
         return (
             base_path.with_suffix('.index.pkl'),
@@ -120,64 +522,140 @@ class FigureManager:
             base_path.with_suffix('.meta.pkl')
         )
     
-    def _save_bm25_to_disk(self, figure_id: str):
-        """Save BM25 data to disk for persistence."""
-        if figure_id not in self.bm25_cache:
-            return
-            
+    def _save_bm25_to_disk(self, figure_id: str, snapshot: tuple):
+        """Save a BM25 snapshot (see _bm25_snapshot) to disk for persistence.
+        
+        Only the minimal index state is kept: vocabulary, idf, document lengths
+        and the postings offsets go to an .npz archive, the postings themselves
+        (document ids and term frequencies, the bulk of the index) to a plain
+        .npy file that is memory-mapped on load, and token/metadata/text lists
+        to JSON. Every file is replaced atomically, and the .npz that the
+        loader checks first is written last.
+        """
         try:
-            index_path, docs_path, meta_path = self._get_bm25_paths(figure_id)
-            
-            with open(index_path, 'wb') as f:
-                pickle.dump(self.bm25_cache[figure_id], f)
-            
-            with open(docs_path, 'wb') as f:
-                pickle.dump(self.bm25_documents_cache.get(figure_id, []), f)
-            
-            with open(meta_path, 'wb') as f:
-                pickle.dump(self.bm25_metadata_cache.get(figure_id, []), f)
+            index_path, postings_path, docs_path, meta_path, texts_path = self._get_bm25_paths(figure_id)
+            bm25_index, scorer, token_lists, metadata_list, text_list = snapshot
+            
+            # Row 0: document ids, row 1: term frequencies. Replaced rather than rewritten,
+            # so a scorer still mapping the previous file keeps valid pages
+            buffer = io.BytesIO()
+            np.save(buffer, np.vstack([scorer.doc_ids, scorer.tfs]).astype(np.int32, copy=False))
+            _atomic_write(postings_path, buffer.getvalue())
+            
+            _atomic_write(docs_path, orjson.dumps(token_lists))
+            _atomic_write(meta_path, orjson.dumps(metadata_list))
+            _atomic_write(texts_path, orjson.dumps(text_list))
+            
+            buffer = io.BytesIO()
+            np.savez(
+                buffer,
+                version=np.int32(_BM25_FORMAT_VERSION),
+                terms=np.array(list(scorer.vocab), dtype=str),
+                idf_values=scorer.idf,
+                indptr=scorer.indptr,
+                doc_len=np.array(bm25_index.doc_len, dtype=np.int32),
+                params=np.array([bm25_index.k1, bm25_index.b, bm25_index.epsilon,
+                                 bm25_index.avgdl, bm25_index.average_idf], dtype=np.float64),
+            )
+            _atomic_write(index_path, buffer.getvalue())
                 
             logger.debug(f"Saved BM25 data to disk for figure {figure_id}")
         except Exception as e:
             logger.error(f"Error saving BM25 data for figure {figure_id}: {e}")
     
-    def _load_bm25_from_disk(self, figure_id: str) -> bool:
-        """Load BM25 data from disk if available."""
+    def _load_bm25_snapshot(self, figure_id: str) -> Optional[tuple]:
+        """Load and cache BM25 data from disk if available and in the current format.
+        
+        Returns the loaded snapshot (see _bm25_snapshot), or None.
+        """
         try:
-            index_path, docs_path, meta_path = self._get_bm25_paths(figure_id)
+            paths = self._get_bm25_paths(figure_id)
+            index_path, postings_path, docs_path, meta_path, texts_path = paths
             
-            if not all(p.exists() for p in [index_path, docs_path, meta_path]):
-                return False
+            if not all(p.exists() for p in paths):
+                return None
             
-            with open(index_path, 'rb') as f:
-                self.bm25_cache[figure_id] = pickle.load(f)
+            with np.load(index_path, allow_pickle=False) as data:
+                if int(data["version"]) != _BM25_FORMAT_VERSION:
+                    logger.info(f"BM25 data for figure {figure_id} is in an old format; rebuilding")
+                    return None
+                terms = data["terms"].tolist()
+                idf_values = data["idf_values"]
+                doc_len = data["doc_len"].tolist()
+                k1, b, epsilon, avgdl, average_idf = data["params"].tolist()
+                # Pages of the postings are read only when a query term needs them
+                postings = np.load(postings_path, mmap_mode='r', allow_pickle=False)
+                if postings.shape != (2, int(data["indptr"][-1])):
+                    logger.warning(f"BM25 postings for figure {figure_id} are inconsistent; rebuilding")
+                    return None
+                scorer = SparseBM25.from_arrays(
+                    terms=terms,
+                    indptr=data["indptr"],
+                    doc_ids=postings[0],
+                    tfs=postings[1],
+                    idf=idf_values,
+                    doc_len=doc_len,
+                    k1=k1,
+                    b=b,
+                    avgdl=avgdl,
+                )
             
             with open(docs_path, 'rb') as f:
-                self.bm25_documents_cache[figure_id] = pickle.load(f)
+                token_lists = orjson.loads(f.read())
             
             with open(meta_path, 'rb') as f:
-                self.bm25_metadata_cache[figure_id] = pickle.load(f)
+                metadata_list = orjson.loads(f.read())
+            
+            with open(texts_path, 'rb') as f:
+                text_list = orjson.loads(f.read())
+            
+            if not len(token_lists) == len(metadata_list) == len(text_list) == len(doc_len):
+                logger.warning(f"BM25 files for figure {figure_id} are inconsistent; rebuilding")
+                return None
+            
+            # Restore the index without BM25Okapi.__init__, which would recompute idf
+            bm25_index = BM25Okapi.__new__(BM25Okapi)
+            bm25_index.k1 = k1
+            bm25_index.b = b
+            bm25_index.epsilon = epsilon
+            bm25_index.tokenizer = None
+            bm25_index.corpus_size = len(doc_len)
+            bm25_index.avgdl = avgdl
+            bm25_index.average_idf = average_idf
+            bm25_index.doc_len = doc_len
+            # Term frequencies are read from the scorer's postings; not recounted per document.
+            # Without doc_freqs this index can't rebuild a scorer, so it is only ever
+            # published together with the one loaded here
+            bm25_index.doc_freqs = []
+            bm25_index.idf = dict(zip(terms, idf_values.tolist()))
+            
+            snapshot = self._publish_bm25(figure_id, bm25_index, scorer, token_lists, metadata_list, text_list)
                 
             logger.info(f"Loaded BM25 data from disk for figure {figure_id}")
-            return True
+            return snapshot
         except Exception as e:
             logger.error(f"Error loading BM25 data for figure {figure_id}: {e}")
-            return False
+            return None
+    
+    def _invalidate_search_cache(self, figure_id: str):
+        """Stop reusing cached search results for a figure whose documents changed."""
+        with self._search_cache_lock:
+            self._search_generations[figure_id] = self._search_generations.get(figure_id, 0) + 1
     
     def _invalidate_bm25_cache(self, figure_id: str):
         """Invalidate BM25 cache for a figure when documents change."""
-        if figure_id in self.bm25_cache:
-            del self.bm25_cache[figure_id]
-        if figure_id in self.bm25_documents_cache:
-            del self.bm25_documents_cache[figure_id]
-        if figure_id in self.bm25_metadata_cache:
-            del self.bm25_metadata_cache[figure_id]
+        self._invalidate_search_cache(figure_id)
+        with self._bm25_lru_lock:
+            self.bm25_cache.pop(figure_id, None)
+            self.bm25_documents_cache.pop(figure_id, None)
+            self.bm25_metadata_cache.pop(figure_id, None)
+            self.bm25_texts_cache.pop(figure_id, None)
+            self.bm25_sparse_cache.pop(figure_id, None)
             
         try:
-            index_path, docs_path, meta_path = self._get_bm25_paths(figure_id)
-            for path in [index_path, docs_path, meta_path]:
-                if path.exists():
-                    path.unlink()
+            # One unlink per path (no exists() stat first); missing files are the common case
+            for path in self._get_bm25_paths(figure_id) + self._get_legacy_bm25_paths(figure_id):
+                path.unlink(missing_ok=True)
         except Exception as e:
             logger.warning(f"Error removing BM25 files for figure {figure_id}: {e}")
             
@@ -194,63 +672,78 @@ class FigureManager:
     def preload_bm25_index(self, figure_id: str) -> bool:
         """Preload BM25 index for a figure from disk or build from ChromaDB."""
         try:
-            if figure_id in self.bm25_cache:
-                return True
-            
-            if self._load_bm25_from_disk(figure_id):
-                return True
-            
-            return self._build_bm25_from_chromadb(figure_id)
-            
+            return self._load_or_build_bm25(figure_id) is not None
         except Exception as e:
             logger.error(f"Error preloading BM25 index for figure {figure_id}: {e}")
             return False
     
+    def _bm25_load_lock(self, figure_id: str) -> threading.Lock:
+        """Per-figure lock serializing BM25 loads, builds and saves within this process."""
+        with self._bm25_lru_lock:
+            return self._bm25_load_locks.setdefault(figure_id, threading.Lock())
+    
+    def _load_or_build_bm25(self, figure_id: str) -> Optional[tuple]:
+        """Return a figure's BM25 snapshot, loading it from disk or building it at most once at a time."""
+        with self._bm25_load_lock(figure_id):
+            # A concurrent caller may have finished loading while we waited
+            snapshot = self._bm25_snapshot(figure_id)
+            if snapshot is None:
+                snapshot = self._load_bm25_snapshot(figure_id)
+            if snapshot is None:
+                snapshot = self._build_bm25_snapshot(figure_id)
+            return snapshot
+    
     def _build_bm25_from_chromadb(self, figure_id: str) -> bool:
         """Build BM25 index from ChromaDB metadata."""
+        with self._bm25_load_lock(figure_id):
+            return self._build_bm25_snapshot(figure_id) is not None
+    
+    def _build_bm25_snapshot(self, figure_id: str) -> Optional[tuple]:
+        """Build, cache and save a BM25 index from ChromaDB, returning its snapshot or None."""
         try:
             collection = self.get_figure_collection(figure_id)
             if not collection:
-                return False
+                return None
             
-            all_docs = collection.get(include=["metadatas"])
+            all_docs = self._call_collection(figure_id, collection, "get", include=["metadatas", "documents"])
             if not all_docs["metadatas"]:
                 logger.info(f"No documents found for figure {figure_id}")
-                return False
+                return None
             
             token_lists = []
             metadata_list = []
+            text_list = []
             
-            for metadata in all_docs["metadatas"]:
+            for metadata, text in zip(all_docs["metadatas"], all_docs["documents"]):
                 tokens_json = metadata.get("processed_tokens", "")
                 if tokens_json:
                     try:
-                        tokens = json.loads(tokens_json)
+                        tokens = orjson.loads(tokens_json)
                         if tokens:
                             token_lists.append(tokens)
-                            metadata_list.append(metadata)
-                    except (json.JSONDecodeError, TypeError) as e:
+                            # Tokens are kept in token_lists; don't store them twice
+                            metadata_list.append({k: v for k, v in metadata.items() if k != "processed_tokens"})
+                            text_list.append(text or "")
+                    except (orjson.JSONDecodeError, TypeError) as e:
                         logger.warning(f"Could not parse processed tokens: {e}")
                         continue
             
             if not token_lists:
                 logger.info(f"No processed tokens found for figure {figure_id}")
-                return False
+                return None
             
             bm25_index = BM25Okapi(token_lists)
+            scorer = SparseBM25.from_bm25(bm25_index)
             
-            self.bm25_cache[figure_id] = bm25_index
-            self.bm25_documents_cache[figure_id] = token_lists
-            self.bm25_metadata_cache[figure_id] = metadata_list
-            
-            self._save_bm25_to_disk(figure_id)
+            snapshot = self._publish_bm25(figure_id, bm25_index, scorer, token_lists, metadata_list, text_list)
+            self._save_bm25_to_disk(figure_id, snapshot)
             
             logger.info(f"Built and cached BM25 index for figure {figure_id}: {len(token_lists)} documents")
-            return True
+            return snapshot
             
         except Exception as e:
             logger.error(f"Error building BM25 index for figure {figure_id}: {e}")
-            return False
+            return None
     
     async def build_bm25_from_chromadb_async(self, figure_id: str) -> bool:
         """Async wrapper for _build_bm25_from_chromadb with write lock protection."""
@@ -260,27 +753,77 @@ class FigureManager:
         finally:
             await self._release_bm25_write_lock(figure_id)
     
-    def _get_bm25_index(self, figure_id: str) -> Optional[BM25Okapi]:
-        """Get BM25 index for a figure, preloading if necessary."""
-        if figure_id not in self.bm25_cache:
-            if not self.preload_bm25_index(figure_id):
+    def _publish_bm25(self, figure_id: str, bm25_index: BM25Okapi, scorer: SparseBM25,
+                      token_lists: List[List[str]], metadata_list: List[Dict[str, Any]],
+                      text_list: List[str]) -> tuple:
+        """Cache all of a figure's BM25 data in one step and evict beyond MAX_BM25_CACHED_FIGURES.
+        
+        Everything is set under _bm25_lru_lock, and bm25_cache (the entry readers
+        check) last, so a reader never sees an index without its scorer and lists.
+        Returns the published snapshot, which stays usable even if it is evicted.
+        """
+        with self._bm25_lru_lock:
+            self.bm25_sparse_cache[figure_id] = scorer
+            self.bm25_documents_cache[figure_id] = token_lists
+            self.bm25_metadata_cache[figure_id] = metadata_list
+            self.bm25_texts_cache[figure_id] = text_list
+            self.bm25_cache[figure_id] = bm25_index
+            self.bm25_cache.move_to_end(figure_id)
+            while 0 < MAX_BM25_CACHED_FIGURES < len(self.bm25_cache):
+                evicted, _ = self.bm25_cache.popitem(last=False)
+                self.bm25_documents_cache.pop(evicted, None)
+                self.bm25_metadata_cache.pop(evicted, None)
+                self.bm25_texts_cache.pop(evicted, None)
+                self.bm25_sparse_cache.pop(evicted, None)
+                logger.debug(f"Evicted BM25 index for figure {evicted} from memory")
+        return (bm25_index, scorer, token_lists, metadata_list, text_list)
+    
+    def _bm25_snapshot(self, figure_id: str, touch: bool = True) -> Optional[tuple]:
+        """Read a cached figure's (index, scorer, token lists, metadata, texts) together, or None.
+        
+        With touch, the figure is also marked as most recently used.
+        """
+        with self._bm25_lru_lock:
+            bm25_index = self.bm25_cache.get(figure_id)
+            if bm25_index is None:
                 return None
-        return self.bm25_cache.get(figure_id)
+            scorer = self.bm25_sparse_cache.get(figure_id)
+            if scorer is None:
+                # Never rebuild from a disk-loaded index (it has no doc_freqs): drop the
+                # entry so the caller reloads everything from disk
+                self.bm25_cache.pop(figure_id, None)
+                return None
+            if touch:
+                self.bm25_cache.move_to_end(figure_id)
+            return (
+                bm25_index,
+                scorer,
+                self.bm25_documents_cache.get(figure_id, []),
+                self.bm25_metadata_cache.get(figure_id, []),
+                self.bm25_texts_cache.get(figure_id, []),
+            )
+    
+    def _get_bm25_data(self, figure_id: str) -> Optional[tuple]:
+        """Get a figure's BM25 snapshot (see _bm25_snapshot), loading or building it if necessary."""
+        snapshot = self._bm25_snapshot(figure_id)
+        if snapshot is not None:
+            return snapshot
+        return self._load_or_build_bm25(figure_id)
 
     def create_figure(self, figure_id: str, name: str, description: str = "", 
                      personality_prompt: str = "", metadata: Dict[str, Any] = None) -> bool:
         """Create a new historical figure with validation."""
         try:
-            if not re.match(r'^[a-zA-Z_-]+$', figure_id):
+            if not _FIGURE_ID_RE.match(figure_id):
                 logger.error(f"Invalid figure_id format: {figure_id}")
                 return False
             
-            if re.search(r'[#$%^&*+=\\|`~@]', name):
+            if not _INVALID_NAME_CHARS.isdisjoint(name):
                 logger.error(f"Invalid name format: {name}")
                 return False
             
-            description = description[:400] if description else ""
-            personality_prompt = personality_prompt[:400] if personality_prompt else ""
+            description = _clamp(description, _MAX_FIELD_CHARS)
+            personality_prompt = _clamp(personality_prompt, _MAX_FIELD_CHARS)
             
             figure_path = self.figures_dir / figure_id
             
@@ -300,14 +843,12 @@ class FigureManager:
                 "metadata": metadata or {}
             }
             
-            metadata_file = figure_path / "metadata.json"
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(figure_metadata, f, indent=2, ensure_ascii=False)
+            self._write_metadata_file(figure_id, figure_metadata)
             
             collection_name = f"figure_{figure_id}"
-            self.client.get_or_create_collection(
+            self._collections[figure_id] = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine", "figure_id": figure_id}
+                metadata=self._collection_metadata(figure_id)
             )
             
             logger.info(f"Created figure: {name} ({figure_id})")
@@ -330,17 +871,13 @@ class FigureManager:
         figures = []
         
         try:
-            for figure_dir in self.figures_dir.iterdir():
-                if figure_dir.is_dir():
-                    metadata_file = figure_dir / "metadata.json"
-                    if metadata_file.exists():
-                        try:
-                            with open(metadata_file, 'r', encoding='utf-8') as f:
-                                metadata = json.load(f)
-                                figures.append(metadata)
-                        except (json.JSONDecodeError, FileNotFoundError):
-                            logger.warning(f"Invalid metadata file for figure: {figure_dir.name}")
-                            continue
+            with self._index_lock:
+                entries = copy.deepcopy(self._load_figure_index())
+            with self._pending_lock:
+                pending = {figure_id: dict(fields) for figure_id, fields in self._pending_metadata.items()}
+            for figure_id, metadata in entries.items():
+                metadata.update(pending.get(figure_id, {}))
+                figures.append(metadata)
             
             return sorted(figures, key=lambda x: x.get('name', ''))
         
@@ -356,12 +893,12 @@ class FigureManager:
     def get_figure_metadata(self, figure_id: str) -> Optional[Dict[str, Any]]:
         """Get metadata for a specific figure."""
         try:
-            metadata_file = self.figures_dir / figure_id / "metadata.json"
-            if not metadata_file.exists():
+            metadata = self._read_metadata_file(figure_id)
+            if metadata is None:
                 return None
             
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            metadata.update(self._pending_fields(figure_id))
+            return metadata
         
         except Exception as e:
             logger.error(f"Error getting metadata for figure {figure_id}: {e}")
@@ -375,26 +912,23 @@ class FigureManager:
     def update_figure_metadata(self, figure_id: str, updates: Dict[str, Any]) -> bool:
         """Update metadata for a figure with validation."""
         try:
-            metadata = self.get_figure_metadata(figure_id)
-            if not metadata:
+            if not self._figure_exists(figure_id):
                 logger.error(f"Figure {figure_id} not found")
                 return False
             
             if 'name' in updates and updates['name']:
-                if re.search(r'[#$%^&*+=\\|`~@]', updates['name']):
+                if not _INVALID_NAME_CHARS.isdisjoint(updates['name']):
                     logger.error(f"Invalid name format: {updates['name']}")
                     return False
             
             if 'description' in updates:
-                updates['description'] = updates['description'][:400] if updates['description'] else ""
+                updates['description'] = _clamp(updates['description'], _MAX_FIELD_CHARS)
             if 'personality_prompt' in updates:
-                updates['personality_prompt'] = updates['personality_prompt'][:400] if updates['personality_prompt'] else ""
-            
-            metadata.update(updates)
+                updates['personality_prompt'] = _clamp(updates['personality_prompt'], _MAX_FIELD_CHARS)
             
-            metadata_file = self.figures_dir / figure_id / "metadata.json"
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            # Written together with any deferred fields
+            if not self._flush_metadata(figure_id, updates):
+                return False
             
             logger.info(f"Updated metadata for figure: {figure_id}")
             return True
@@ -412,19 +946,29 @@ class FigureManager:
         """Delete a figure and all its data: collection, files, BM25 cache, and image."""
         try:
             figure_path = self.figures_dir / figure_id
-            if not figure_path.exists():
+            if not figure_path.is_dir():
                 logger.error(f"Figure {figure_id} not found")
                 return False
             
             # Delete ChromaDB collection
             collection_name = f"figure_{figure_id}"
-            try:
-                self.client.delete_collection(collection_name)
-            except Exception as e:
-                logger.warning(f"Error deleting collection {collection_name}: {e}")
+            self._collections.pop(figure_id, None)
+            if figure_id in self._pending_empty_collections:
+                # Already deleted by a clear and not recreated since
+                self._pending_empty_collections.discard(figure_id)
+            else:
+                try:
+                    self.client.delete_collection(collection_name)
+                except Exception as e:
+                    logger.warning(f"Error deleting collection {collection_name}: {e}")
             
-            # Invalidate BM25 cache and remove pickle files
+            # Invalidate BM25 cache and remove its files
             self._invalidate_bm25_cache(figure_id)
+            with self._doc_counts_lock:
+                self._doc_counts.pop(figure_id, None)
+            with self._pending_lock:
+                self._pending_metadata.pop(figure_id, None)
+            self._metadata_cache.pop(figure_id, None)
             
             # Remove figure image if it exists
             try:
@@ -440,6 +984,7 @@ class FigureManager:
             
             # Remove figure directory (metadata.json, etc.)
             shutil.rmtree(figure_path)
+            self._update_figure_index(figure_id, None)
             
             logger.info(f"Deleted figure: {figure_id}")
             return True
@@ -453,15 +998,54 @@ class FigureManager:
         """Async wrapper for delete_figure."""
         return await asyncio.to_thread(self.delete_figure, figure_id)
     
+    def _figure_exists(self, figure_id: str) -> bool:
+        """Cheap existence check: one stat of the figure's metadata.json (no ChromaDB round-trip)."""
+        return (self.figures_dir / figure_id / "metadata.json").is_file()
+    
     def get_figure_collection(self, figure_id: str):
         """Get ChromaDB collection for a figure."""
+        # A cached handle needs no existence check: deleting the figure here drops it,
+        # and if another process deleted it, _call_collection's retry comes back here
+        collection = self._collections.get(figure_id)
+        if collection is not None:
+            return collection
+        
+        if not self._figure_exists(figure_id):
+            logger.error(f"Figure {figure_id} not found")
+            return None
+        
         try:
-            collection_name = f"figure_{figure_id}"
-            return self.client.get_collection(collection_name)
+            # The figure exists on disk, so a missing collection was dropped by a clear
+            # (in this or another process, possibly before a restart): recreate it empty.
+            # An existing collection keeps its own metadata.
+            collection = self.client.get_or_create_collection(
+                name=f"figure_{figure_id}",
+                metadata=self._collection_metadata(figure_id)
+            )
+            self._pending_empty_collections.discard(figure_id)
+            self._collections[figure_id] = collection
+            return collection
         except Exception as e:
             logger.error(f"Error getting collection for figure {figure_id}: {e}")
             return None
     
+    def _call_collection(self, figure_id: str, collection, method: str, *args, **kwargs):
+        """Call a collection method, re-resolving the handle once if it has gone stale.
+        
+        Cached handles point at a collection id; if another process deleted and
+        recreated the figure's collection, that id no longer exists.
+        """
+        try:
+            return getattr(collection, method)(*args, **kwargs)
+        except NotFoundError:
+            if self._collections.get(figure_id) is collection:
+                self._collections.pop(figure_id, None)
+            fresh = self.get_figure_collection(figure_id)
+            if fresh is None or fresh is collection:
+                raise
+            logger.info(f"Collection handle for figure {figure_id} was stale; looked it up again")
+            return getattr(fresh, method)(*args, **kwargs)
+    
     def add_document_to_figure(self, figure_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
         """Add a document chunk to a figure's collection.
         
@@ -469,43 +1053,108 @@ class FigureManager:
         BM25 index is NOT rebuilt here — call invalidate_bm25_cache() after
         the entire upload batch completes, and BM25 will rebuild lazily on next search.
         """
+        doc_ids = self.add_documents_to_figure(figure_id, [text], [metadata])
+        return doc_ids[0] if doc_ids else None
+
+    # Async wrapper
+    async def add_document_to_figure_async(self, figure_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
+        """Async wrapper for add_document_to_figure."""
+        return await asyncio.to_thread(self.add_document_to_figure, figure_id, text, metadata)
+    
+    def add_documents_to_figure(self, figure_id: str, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Add a batch of document chunks to a figure's collection.
+        
+        Texts are embedded in batches of _ADD_BATCH_SIZE, and each batch is
+        written with a single ChromaDB add on the writer thread while the next
+        batch is being encoded. Returns the IDs of the documents added; if a
+        batch fails, the remaining ones are skipped and only the IDs already
+        written are returned. As with add_document_to_figure, the BM25 index is
+        not rebuilt here.
+        """
+        if not texts:
+            return []
+        
+        # get_figure_collection checks that the figure exists
+        collection = self.get_figure_collection(figure_id)
+        if not collection:
+            logger.error(f"Collection not found for figure: {figure_id}")
+            return []
+        
+        doc_ids = []
+        in_flight = None  # (ids, future) of the batch currently being written
         try:
-            collection = self.get_figure_collection(figure_id)
-            if not collection:
-                logger.error(f"Collection not found for figure: {figure_id}")
-                return None
-            
-            embedding = self.embedding_provider.encode_document_sync(text)
-            
+            for start in range(0, len(texts), _ADD_BATCH_SIZE):
+                batch_texts = texts[start:start + _ADD_BATCH_SIZE]
+                embeddings = self.embedding_provider.encode_document_sync(batch_texts, as_numpy=True)
+                batch_ids, batch_metadatas = self._prepare_documents(
+                    figure_id, batch_texts, metadatas[start:start + _ADD_BATCH_SIZE]
+                )
+                
+                # At most one write outstanding: wait for the previous batch, then
+                # hand this one to the writer and go back to encoding
+                if in_flight:
+                    (written_ids, future), in_flight = in_flight, None
+                    future.result()
+                    doc_ids.extend(written_ids)
+                in_flight = (batch_ids, self._writer.submit(
+                    self._call_collection, figure_id, collection, "add",
+                    documents=batch_texts,
+                    embeddings=embeddings,
+                    metadatas=batch_metadatas,
+                    ids=batch_ids
+                ))
+            
+            (written_ids, future), in_flight = in_flight, None
+            future.result()
+            doc_ids.extend(written_ids)
+        
+        except Exception as e:
+            logger.error(f"Error adding documents to figure {figure_id}: {e}")
+            # A write still in flight may have succeeded; count it if so
+            if in_flight:
+                try:
+                    in_flight[1].result()
+                    doc_ids.extend(in_flight[0])
+                except Exception:
+                    pass
+        
+        if doc_ids:
+            self._invalidate_search_cache(figure_id)
+            with self._doc_counts_lock:
+                if figure_id in self._doc_counts:
+                    self._doc_counts[figure_id] += len(doc_ids)
+            # Kept in memory; written once by flush() / sync_document_count after the load
+            self._set_metadata_field(figure_id, "document_count", self._document_count(figure_id, collection))
+            logger.debug(f"Added {len(doc_ids)} documents to figure {figure_id}")
+        
+        return doc_ids
+    
+    def _prepare_documents(self, figure_id: str, texts: List[str],
+                           metadatas: List[Dict[str, Any]]) -> tuple:
+        """Generate IDs and build metadata (with processed BM25 tokens) for new documents."""
+        doc_ids = []
+        metadatas_with_ids = []
+        for text, metadata in zip(texts, metadatas):
             doc_id = self._generate_doc_id(figure_id)
-            
             processed_tokens = text_processor.process_text(text)
             
             metadata_with_id = {**metadata, "doc_id": doc_id}
             if processed_tokens:
-                metadata_with_id["processed_tokens"] = json.dumps(processed_tokens)
+                # orjson keeps CJK tokens as UTF-8 instead of \uXXXX escapes
+                metadata_with_id["processed_tokens"] = orjson.dumps(processed_tokens).decode()
                 logger.debug(f"Added {len(processed_tokens)} processed tokens to metadata for {doc_id}")
             else:
                 logger.warning(f"No tokens extracted for {doc_id}, BM25 search may be limited")
             
-            collection.add(
-                documents=[text],
-                embeddings=[embedding],
-                metadatas=[metadata_with_id],
-                ids=[doc_id]
-            )
-            
-            logger.debug(f"Added document to figure {figure_id}: {doc_id}")
-            return doc_id
-        
-        except Exception as e:
-            logger.error(f"Error adding document to figure {figure_id}: {e}")
-            return None
+            doc_ids.append(doc_id)
+            metadatas_with_ids.append(metadata_with_id)
+        return doc_ids, metadatas_with_ids
 
     # Async wrapper
-    async def add_document_to_figure_async(self, figure_id: str, text: str, metadata: Dict[str, Any]) -> Optional[str]:
-        """Async wrapper for add_document_to_figure."""
-        return await asyncio.to_thread(self.add_document_to_figure, figure_id, text, metadata)
+    async def add_documents_to_figure_async(self, figure_id: str, texts: List[str],
+                                            metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Async wrapper for add_documents_to_figure."""
+        return await asyncio.to_thread(self.add_documents_to_figure, figure_id, texts, metadatas)
     
     def sync_document_count(self, figure_id: str) -> bool:
         """Sync the document count in metadata with the actual collection count."""
@@ -514,13 +1163,16 @@ class FigureManager:
             if not collection:
                 return False
             
-            figure_metadata = self.get_figure_metadata(figure_id)
-            if figure_metadata:
-                figure_metadata["document_count"] = collection.count()
-                self.update_figure_metadata(figure_id, figure_metadata)
-                logger.info(f"Synced document count for {figure_id}: {collection.count()}")
-                return True
-            return False
+            # Re-count: the collection may have been changed by another process
+            count = self._call_collection(figure_id, collection, "count")
+            with self._doc_counts_lock:
+                self._doc_counts[figure_id] = count
+            # Internal counter write-back: no need for update_figure_metadata's
+            # re-read, validation and clamping of user-editable fields
+            if not self._set_metadata_field(figure_id, "document_count", count, persist=True):
+                return False
+            logger.info(f"Synced document count for {figure_id}: {count}")
+            return True
         except Exception as e:
             logger.error(f"Error syncing document count for {figure_id}: {e}")
             return False
@@ -533,42 +1185,122 @@ class FigureManager:
     def search_figure_documents(self, figure_id: str, query: str, n_results: int = 5, 
                                min_cosine_similarity: float = MIN_COSINE_SIMILARITY) -> List[Dict[str, Any]]:
         """Search for similar documents in a figure's collection using hybrid search."""
+        if not self._figure_exists(figure_id):
+            logger.warning(f"Search on unknown figure: {figure_id}")
+            return []
+        
+        cache_key = None
+        if SEARCH_RESULT_CACHE_SIZE > 0:
+            with self._search_cache_lock:
+                generation = self._search_generations.get(figure_id, 0)
+            stamp = self._search_cache_stamp(figure_id)
+            if stamp is not None:
+                cache_key = (figure_id, generation, stamp, query, n_results, min_cosine_similarity)
+                with self._search_cache_lock:
+                    cached = self._search_cache.get(cache_key)
+                    if cached is not None:
+                        self._search_cache.move_to_end(cache_key)
+                        return orjson.loads(cached)
+        
         try:
-            self.preload_bm25_index(figure_id)
+            preload = self._start_bm25_preload(figure_id)
             
             extended_n_results = min(n_results * SEARCH_MULTIPLIER, MAX_SEARCH_RESULTS)
             
             vector_results = self._search_figure_vector(figure_id, query, extended_n_results)
-            
-            filtered_vector_results = [
-                r for r in vector_results 
-                if r.get("similarity", 0) >= min_cosine_similarity
-            ]
-            
-            logger.info(f"Figure {figure_id} vector search: {len(vector_results)} results, "
-                        f"{len(filtered_vector_results)} after filtering (min similarity: {min_cosine_similarity})")
-            
-            if not filtered_vector_results:
-                logger.warning(f"No results with sufficient cosine similarity found for figure {figure_id}")
+            if preload:
+                preload.result()
+            if vector_results is None:
                 return []
             
-            bm25_results = self._search_figure_bm25(figure_id, query, extended_n_results)
-            
-            logger.info(f"Figure {figure_id} hybrid search: vector={len(filtered_vector_results)}, bm25={len(bm25_results)} results")
+            results, complete = self._fuse_hybrid_results(figure_id, query, vector_results, extended_n_results,
+                                                          n_results, min_cosine_similarity)
             
-            fused_results = reciprocal_rank_fusion(filtered_vector_results, bm25_results, k=RRF_K)
-            
-            final_results = [
-                r for r in fused_results 
-                if r.get("cosine_similarity", 0) >= min_cosine_similarity
-            ]
-            
-            return final_results[:n_results]
+            # Results degraded by a failed BM25 search, or empty ones, are never reused
+            if cache_key is not None and complete and results:
+                self._store_search_results(cache_key, results)
+            return results
         
         except Exception as e:
             logger.error(f"Error in hybrid search for figure {figure_id}: {e}")
             return []
 
+    def _search_cache_stamp(self, figure_id: str) -> Optional[int]:
+        """Mark the state of a figure's documents as seen by every process, or None if unknown.
+        
+        Other processes (e.g. debug/figure_cli.py) don't bump this process's generation,
+        but their adds and clears rewrite metadata.json (adds on flush), so its mtime is
+        one stat that catches both.
+        """
+        try:
+            return (self.figures_dir / figure_id / "metadata.json").stat().st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Not caching search results for figure {figure_id}: {e}")
+            return None
+    
+    def _store_search_results(self, cache_key: tuple, results: List[Dict[str, Any]]):
+        """Cache a copy of search results and evict beyond SEARCH_RESULT_CACHE_SIZE."""
+        try:
+            data = orjson.dumps(results, option=orjson.OPT_SERIALIZE_NUMPY)
+        except orjson.JSONEncodeError as e:
+            logger.warning(f"Not caching search results: {e}")
+            return
+        with self._search_cache_lock:
+            self._search_cache[cache_key] = data
+            while len(self._search_cache) > SEARCH_RESULT_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+
+    def _start_bm25_preload(self, figure_id: str):
+        """Load a figure's BM25 index in the background if it isn't cached yet.
+        
+        Returns the future to wait on before BM25 search, or None when the
+        index is already in memory. Disk or ChromaDB loading then overlaps
+        with query encoding and the vector search.
+        """
+        if figure_id in self.bm25_cache:
+            return None
+        return self._bm25_loader.submit(self.preload_bm25_index, figure_id)
+
+    def _fuse_hybrid_results(self, figure_id: str, query: str, vector_results: List[Dict[str, Any]],
+                             extended_n_results: int, n_results: int,
+                             min_cosine_similarity: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """Filter vector results by similarity, add BM25 results, and fuse them (RRF or CombSUM).
+        
+        Returns the results and whether the BM25 search succeeded (if it ran).
+        """
+        filtered_vector_results = [
+            r for r in vector_results 
+            if r.get("similarity", 0) >= min_cosine_similarity
+        ]
+        
+        logger.info(f"Figure {figure_id} vector search: {len(vector_results)} results, "
+                    f"{len(filtered_vector_results)} after filtering (min similarity: {min_cosine_similarity})")
+        
+        if not filtered_vector_results:
+            logger.warning(f"No results with sufficient cosine similarity found for figure {figure_id}")
+            return [], True
+        
+        bm25_results = self._search_figure_bm25(figure_id, query, extended_n_results)
+        complete = bm25_results is not None
+        if not complete:
+            bm25_results = []
+        
+        logger.info(f"Figure {figure_id} hybrid search: vector={len(filtered_vector_results)}, bm25={len(bm25_results)} results")
+        
+        # Only BM25-only hits can fail the similarity filter below, so this many always suffice
+        top_k = n_results + len(bm25_results)
+        if FUSION_METHOD == "combsum":
+            fused_results = combsum_fusion(filtered_vector_results, bm25_results, alpha=FUSION_ALPHA, top_k=top_k)
+        else:
+            fused_results = reciprocal_rank_fusion(filtered_vector_results, bm25_results, k=RRF_K, top_k=top_k)
+        
+        final_results = [
+            r for r in fused_results 
+            if r["cosine_similarity"] >= min_cosine_similarity
+        ]
+        
+        return final_results[:n_results], complete
+
     # Async wrapper
     async def search_figure_documents_async(self, figure_id: str, query: str, n_results: int = 5,
                                            min_cosine_similarity: float = MIN_COSINE_SIMILARITY) -> List[Dict[str, Any]]:
@@ -581,17 +1313,21 @@ class FigureManager:
         finally:
             await self._release_bm25_read_lock(figure_id)
     
-    def _search_figure_vector(self, figure_id: str, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Perform vector search for a figure."""
+    def _search_figure_vector(self, figure_id: str, query: str, n_results: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Perform vector search for a figure.
+        
+        Returns None if the search failed, so callers can tell it from finding nothing.
+        """
         try:
             collection = self.get_figure_collection(figure_id)
             if not collection:
-                return []
+                return None
             
-            query_embedding = self.embedding_provider.encode_query_sync(query)
+            query_embeddings = self.embedding_provider.encode_query_sync([query], as_numpy=True)
             
-            results = collection.query(
-                query_embeddings=[query_embedding],
+            results = self._call_collection(
+                figure_id, collection, "query",
+                query_embeddings=query_embeddings,
                 n_results=n_results,
                 include=["documents", "metadatas", "distances"]
             )
@@ -615,46 +1351,20 @@ class FigureManager:
         
         except Exception as e:
             logger.error(f"Error in vector search for figure {figure_id}: {e}")
-            return []
+            return None
     
-    def _calculate_term_scores(self, bm25_index, query_tokens: List[str], doc_tokens: List[str], doc_idx: int) -> Dict[str, float]:
-        """Calculate BM25 contribution score for each query term in a document."""
-        term_scores = {}
-        
-        if not bm25_index:
-            return term_scores
-        
-        doc_len = len(doc_tokens)
-        avgdl = bm25_index.avgdl
-        
-        k1 = bm25_index.k1
-        b = bm25_index.b
+    def _search_figure_bm25(self, figure_id: str, query: str, n_results: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Perform BM25 search for a figure using cached index with top matching words.
         
-        for term in query_tokens:
-            if term in doc_tokens:
-                tf = doc_tokens.count(term)
-                
-                if hasattr(bm25_index, 'idf') and term in bm25_index.idf:
-                    idf = bm25_index.idf[term]
-                else:
-                    idf = 0
-                
-                numerator = tf * (k1 + 1)
-                denominator = tf + k1 * (1 - b + b * doc_len / avgdl)
-                term_score = idf * (numerator / denominator)
-                
-                term_scores[term] = term_score
-        
-        return term_scores
-    
-    def _search_figure_bm25(self, figure_id: str, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Perform BM25 search for a figure using cached index with top matching words."""
+        Returns None if the search failed, so callers can tell it from finding nothing.
+        """
         try:
-            bm25_index = self._get_bm25_index(figure_id)
+            bm25_data = self._get_bm25_data(figure_id)
             
-            if not bm25_index:
+            if not bm25_data:
                 logger.warning(f"No BM25 index available for figure {figure_id}")
-                return []
+                return None
+            _, scorer, _, cached_metadata, cached_texts = bm25_data
             
             query_tokens = text_processor.process_query(query)
             
@@ -662,100 +1372,97 @@ class FigureManager:
                 logger.warning("No tokens extracted from query")
                 return []
             
-            scores = bm25_index.get_scores(query_tokens)
+            scores = scorer.get_scores(query_tokens)
             
-            top_indices = np.argsort(scores)[::-1][:n_results]
+            # Partial selection of the top k, then sort only those k
+            k = min(n_results, len(scores))
+            if k <= 0:
+                return []
+            top_unsorted = np.argpartition(scores, -k)[-k:]
+            top_indices = top_unsorted[np.argsort(scores[top_unsorted])[::-1]]
             
-            cached_metadata = self.bm25_metadata_cache.get(figure_id, [])
             if not cached_metadata:
                 logger.warning(f"No cached metadata for figure {figure_id}")
-                return []
+                return None
             
-            bm25_documents = self.bm25_documents_cache.get(figure_id, [])
-            
-            collection = self.get_figure_collection(figure_id)
-            if not collection:
-                return []
+            top_indices = top_indices[(top_indices < len(cached_metadata)) & (scores[top_indices] > 0)]
+            # Plain Python ints and floats, converted in one call each
+            hit_indices = top_indices.tolist()
+            hit_scores = scores[top_indices].tolist()
+            hit_ids = [cached_metadata[idx].get("doc_id", f"doc_{idx}") for idx in hit_indices]
+            
+            # Texts come from the BM25 cache; fall back to one ChromaDB round trip
+            id_to_text = {}
+            if len(cached_texts) == len(cached_metadata):
+                id_to_text = {doc_id: cached_texts[idx] for idx, doc_id in zip(hit_indices, hit_ids)}
+            elif hit_ids:
+                collection = self.get_figure_collection(figure_id)
+                if not collection:
+                    return None
+                try:
+                    chroma_results = self._call_collection(figure_id, collection, "get",
+                                                           ids=hit_ids, include=["documents"])
+                    id_to_text = dict(zip(chroma_results["ids"], chroma_results["documents"]))
+                except Exception as e:
+                    logger.warning(f"Could not retrieve texts for BM25 results: {e}")
+            
+            # Hits can only match query terms, so resolve their display forms once per query
+            term_display = {term: _display_term(term) for term in query_tokens}
+            
+            # Per-term contributions for all hits at once, from the scorer's postings
+            hit_term_scores = scorer.term_scores(query_tokens, hit_indices)
             
             results = []
-            for idx in top_indices:
-                if idx < len(cached_metadata) and idx < len(scores) and scores[idx] > 0:
-                    metadata = cached_metadata[idx]
-                    doc_id = metadata.get("doc_id", f"doc_{idx}")
-                    
-                    try:
-                        chroma_results = collection.get(
-                            ids=[doc_id],
-                            include=["documents"]
-                        )
-                        text = ""
-                        if chroma_results["documents"]:
-                            text = chroma_results["documents"][0]
-                    except Exception as e:
-                        logger.warning(f"Could not retrieve text for doc_id {doc_id}: {e}")
-                        text = ""
-                    
-                    top_matching_words = []
-                    if idx < len(bm25_documents):
-                        doc_tokens = bm25_documents[idx]
-                        term_scores = self._calculate_term_scores(bm25_index, query_tokens, doc_tokens, idx)
-                        
-                        sorted_terms = sorted(term_scores.items(), key=lambda x: x[1], reverse=True)
-                        
-                        filtered_terms = []
-                        for term, score in sorted_terms:
-                            if '_' in term:
-                                components = term.split('_')
-                                if any(comp.lower() in text_processor.stopwords for comp in components):
-                                    continue
-                                display_term = term.replace('_', ' ')
-                            else:
-                                if term.lower() in text_processor.stopwords:
-                                    continue
-                                display_term = term
-                            filtered_terms.append(display_term)
-                        
-                        top_matching_words = filtered_terms[:5] if filtered_terms else []
-                    
-                    results.append({
-                        "text": text,
-                        "metadata": metadata,
-                        "bm25_score": float(scores[idx]),
-                        "top_matching_words": top_matching_words,
-                        "document_id": doc_id
-                    })
+            for idx, doc_id, score, term_scores in zip(hit_indices, hit_ids, hit_scores, hit_term_scores):
+                metadata = cached_metadata[idx]
+                text = id_to_text.get(doc_id) or ""
+                
+                top_matching_words = []
+                sorted_terms = sorted(term_scores.items(), key=itemgetter(1), reverse=True)
+                for term, _ in sorted_terms:
+                    display_term = term_display.get(term)
+                    if display_term is not None:
+                        top_matching_words.append(display_term)
+                        if len(top_matching_words) == _MAX_MATCHING_WORDS:
+                            break
+                
+                results.append({
+                    "text": text,
+                    "metadata": metadata,
+                    "bm25_score": score,
+                    "top_matching_words": top_matching_words,
+                    "document_id": doc_id
+                })
             
             return results
         
         except Exception as e:
             logger.error(f"Error in BM25 search for figure {figure_id}: {e}")
-            return []
+            return None
     
     def clear_figure_documents(self, figure_id: str) -> bool:
         """Clear all documents from a figure's collection."""
         try:
             collection_name = f"figure_{figure_id}"
             
-            if not self.get_figure_metadata(figure_id):
+            if not self._figure_exists(figure_id):
                 logger.error(f"Figure {figure_id} not found")
                 return False
             
-            try:
-                self.client.delete_collection(collection_name)
-            except Exception as e:
-                logger.warning(f"Collection {collection_name} may not exist: {e}")
+            self._collections.pop(figure_id, None)
+            if figure_id not in self._pending_empty_collections:
+                try:
+                    self.client.delete_collection(collection_name)
+                except Exception as e:
+                    logger.warning(f"Collection {collection_name} may not exist: {e}")
             
-            self.client.create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine", "figure_id": figure_id}
-            )
+            # The empty collection is created by get_figure_collection when next needed
+            self._pending_empty_collections.add(figure_id)
             
             self._invalidate_bm25_cache(figure_id)
-            
-            figure_metadata = self.get_figure_metadata(figure_id)
-            if figure_metadata:
-                figure_metadata["document_count"] = 0
-                self.update_figure_metadata(figure_id, figure_metadata)
+            with self._doc_counts_lock:
+                self._doc_counts[figure_id] = 0
+            self._set_metadata_field(figure_id, "document_count", 0, persist=True)
             
             logger.info(f"Cleared all documents from figure: {figure_id}")
             return True
@@ -772,15 +1479,18 @@ class FigureManager:
     def get_figure_stats(self, figure_id: str) -> Dict[str, Any]:
         """Get statistics for a figure's document collection."""
         try:
-            collection = self.get_figure_collection(figure_id)
-            if not collection:
+            # Served from metadata (with this process's deferred count) without a ChromaDB
+            # COUNT; other processes' adds show up once they flush, and
+            # sync_document_count reconciles it with the collection
+            metadata = self.get_figure_metadata(figure_id)
+            if metadata is None:
+                logger.error(f"Figure {figure_id} not found")
                 return {"error": "Figure not found"}
             
-            metadata = self.get_figure_metadata(figure_id)
             return {
                 "figure_id": figure_id,
-                "name": metadata.get("name", "Unknown") if metadata else "Unknown",
-                "document_count": collection.count(),
+                "name": metadata.get("name", "Unknown"),
+                "document_count": metadata.get("document_count", 0),
                 "collection_name": f"figure_{figure_id}"
             }
         
@@ -810,25 +1520,25 @@ def warmup_models():
     """
     Warm up tokenizer, text processor, and embedding model by running simple
     operations.  This loads the models into memory so the first user request
-    is fast.  Call this during server startup.
+    is fast.  The server runs this in the background at startup; failures are
+    logged, never raised.
     """
-    from text_processor import text_processor
-    from embedding_provider import get_embedding_provider
-    
     logger.info("Warming up models...")
     
-    # Warm up tokenizer (e.g. jieba loads its dictionary on first call)
-    logger.info(f"  - Loading tokenizer ({text_processor.tokenizer.name})...")
-    text_processor.tokenizer.warmup()
-    
-    # Warm up text processor (tokenizer + NLTK lemmatizer)
-    logger.info("  - Loading text processor...")
-    text_processor.process_text("This is a test sentence for warming up the text processor.")
-    
-    # Warm up embedding model - first encode loads the model weights
-    logger.info("  - Loading embedding model...")
-    embedding_provider = get_embedding_provider()
-    # Use sync method directly since we're in a thread already
-    embedding_provider._encode_local_sync("Test sentence for embedding warmup")
+    try:
+        # Warm up tokenizer (e.g. jieba loads its dictionary on first call)
+        logger.info(f"  - Loading tokenizer ({text_processor.tokenizer.name})...")
+        text_processor.tokenizer.warmup()
+        
+        # Warm up text processor (tokenizer + NLTK lemmatizer)
+        logger.info("  - Loading text processor...")
+        text_processor.process_text("This is a test sentence for warming up the text processor.")
+        
+        if EMBEDDING_WARMUP:
+            logger.info("  - Loading embedding model...")
+            get_embedding_provider().warmup()
+    except Exception as e:
+        logger.warning(f"Model warmup failed: {e}")
+        return
     
     logger.info("Models warmed up and ready")
@@ -77,13 +77,14 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Historical Figures Chat System...")
     
-    # Preload FigureManager and warm up models so first request is fast
+    # Preload FigureManager, then warm up models in the background so startup
+    # doesn't wait on them (the first requests may still pay part of that cost)
     from figure_manager import get_figure_manager, warmup_models
     import asyncio
     logger.info("Preloading FigureManager...")
     await asyncio.to_thread(get_figure_manager)
-    logger.info("Warming up tokenizer, text processor, and embedding model...")
-    await asyncio.to_thread(warmup_models)
+    logger.info("Warming up tokenizer, text processor, and embedding model in the background...")
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup_models))
     logger.info("System ready")
     
     # Start session cleanup task
@@ -94,6 +95,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Historical Figures Chat System...")
+    # Warmup runs in a thread and can't be interrupted; let it finish before closing the provider
+    await warmup_task
+    # Flushes deferred metadata, waits for the writer and BM25 loader threads, and
+    # releases the embedding provider
+    get_figure_manager().close()
 
 
 # Create FastAPI application
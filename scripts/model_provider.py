@@ -6,6 +6,7 @@ Uses async httpx for non-blocking HTTP requests.
 
 import httpx
 import json
+import orjson
 import logging
 from typing import List, Dict, AsyncGenerator
 
@@ -58,13 +59,13 @@ class LLMProvider:
                                     yield {"done": True}
                                     break
                                 try:
-                                    chunk_data = json.loads(data_str)
+                                    chunk_data = orjson.loads(data_str)
                                     if 'choices' in chunk_data:
                                         delta = chunk_data['choices'][0].get('delta', {})
                                         content = delta.get('content', '')
                                         if content:
                                             yield {"content": content}
-                                except json.JSONDecodeError:
+                                except orjson.JSONDecodeError:
                                     continue
                             
         except httpx.ConnectError as e:
@@ -18,6 +18,11 @@ from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+from config import FUSION_METHOD
+
+# Score label per fusion method, for the retrieved-documents section
+_FUSION_LABELS = {"rrf": "RRF", "combsum": "CombSUM"}
+
 
 def register_unicode_fonts():
     """Register Unicode-capable fonts for PDF generation"""
@@ -299,7 +304,9 @@ def generate_conversation_pdf(data):
                     similarity = doc_data.get('similarity', 0)
                     cosine_similarity = doc_data.get('cosine_similarity', similarity)
                     bm25_score = doc_data.get('bm25_score', 0)
-                    rrf_score = doc_data.get('rrf_score', 0)
+                    # Documents saved before fused_score existed only carry rrf_score
+                    fused_score = doc_data.get('fused_score', doc_data.get('rrf_score', 0))
+                    fusion_label = _FUSION_LABELS.get(doc_data.get('fusion_method', FUSION_METHOD), "Fused")
                     top_matching_words = doc_data.get('top_matching_words', [])
                     
                     header_text = f"Document {idx}: {filename} (Chunk {chunk_id})"
@@ -310,8 +317,8 @@ def generate_conversation_pdf(data):
                         meta_parts.append(f"Cosine Similarity: {cosine_similarity:.2%}")
                     if bm25_score > 0:
                         meta_parts.append(f"BM25 Score: {bm25_score:.2f}")
-                    if rrf_score > 0:
-                        meta_parts.append(f"RRF Score: {rrf_score:.4f}")
+                    if fused_score > 0:
+                        meta_parts.append(f"{fusion_label} Score: {fused_score:.4f}")
                     if top_matching_words:
                         keywords_str = ', '.join(top_matching_words[:5])
                         meta_parts.append(f"Keywords: {keywords_str}")
@@ -2,91 +2,304 @@
 Shared search utilities for hybrid search and result formatting.
 """
 
-from typing import List, Dict, Any
-from config import RRF_K
+import heapq
+from typing import List, Dict, Any, Optional
+import numpy as np
+from config import RRF_K, FUSION_METHOD, FUSION_ALPHA
+
+
+class SparseBM25:
+    """
+    Column-compressed term -> (document, tf) postings for fast BM25 scoring.
+    
+    Built from a fitted BM25Okapi and scores identically to its get_scores(),
+    but only touches the documents that contain each query term, in numpy,
+    instead of looping over every document in Python.
+    """
+    
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, idf: np.ndarray, doc_norm: np.ndarray, k1: float):
+        self.vocab = vocab          # term -> column
+        self.indptr = indptr        # postings of column c are [indptr[c], indptr[c + 1])
+        self.doc_ids = doc_ids      # document index of each posting
+        self.tfs = tfs              # term frequency of each posting (int32, possibly memory-mapped)
+        self.idf = idf              # idf per column
+        self.doc_norm = doc_norm    # k1 * (1 - b + b * doc_len / avgdl) per document
+        self.k1 = k1
+    
+    @classmethod
+    def from_bm25(cls, bm25_index) -> "SparseBM25":
+        """Build postings from a BM25Okapi's per-document term frequencies."""
+        vocab: Dict[str, int] = {}
+        cols, docs, tfs = [], [], []
+        for doc_idx, frequencies in enumerate(bm25_index.doc_freqs):
+            for term, tf in frequencies.items():
+                cols.append(vocab.setdefault(term, len(vocab)))
+                docs.append(doc_idx)
+                tfs.append(tf)
+        
+        cols = np.asarray(cols, dtype=np.int64)
+        order = np.argsort(cols, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(vocab)), out=indptr[1:])
+        
+        return cls.from_arrays(
+            terms=list(vocab),
+            indptr=indptr,
+            doc_ids=np.asarray(docs, dtype=np.int32)[order],
+            tfs=np.asarray(tfs, dtype=np.int32)[order],
+            idf=np.array([bm25_index.idf.get(term, 0.0) for term in vocab], dtype=np.float64),
+            doc_len=bm25_index.doc_len,
+            k1=bm25_index.k1,
+            b=bm25_index.b,
+            avgdl=bm25_index.avgdl,
+        )
+    
+    @classmethod
+    def from_arrays(cls, terms: List[str], indptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                    idf: np.ndarray, doc_len, k1: float, b: float, avgdl: float) -> "SparseBM25":
+        """Build from stored postings; terms are in column order.
+        
+        doc_ids and tfs are kept as given when already int32, so memory-mapped
+        postings stay on disk until a query touches them.
+        """
+        doc_len = np.asarray(doc_len, dtype=np.float64)
+        return cls(
+            vocab={term: col for col, term in enumerate(terms)},
+            indptr=np.asarray(indptr, dtype=np.int64),
+            doc_ids=np.asarray(doc_ids, dtype=np.int32),
+            tfs=np.asarray(tfs, dtype=np.int32),
+            idf=np.asarray(idf, dtype=np.float64),
+            doc_norm=k1 * (1 - b + b * doc_len / avgdl),
+            k1=k1,
+        )
+    
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document for the query (repeated terms count again, as in rank_bm25)."""
+        scores = np.zeros(len(self.doc_norm), dtype=np.float64)
+        for term in query_tokens:
+            col = self.vocab.get(term)
+            if col is None:
+                continue
+            start, end = self.indptr[col], self.indptr[col + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float64)
+            # Each document appears at most once per column, so fancy-index += is safe
+            scores[docs] += self.idf[col] * (tf * (self.k1 + 1) / (tf + self.doc_norm[docs]))
+        return scores
+    
+    def term_scores(self, query_tokens: List[str], doc_indices: List[int]) -> List[Dict[str, float]]:
+        """
+        Per-term BM25 contributions for each of the given documents.
+        
+        Returns one dict per document mapping each query term the document
+        contains to its score, in query order. Postings within a column are
+        sorted by document, so each term is located in all documents with a
+        single searchsorted.
+        """
+        terms = [term for term in dict.fromkeys(query_tokens) if term in self.vocab]
+        if not terms or not doc_indices:
+            return [{} for _ in doc_indices]
+        
+        docs = np.asarray(doc_indices, dtype=np.int32)
+        tf = np.zeros((len(terms), len(docs)), dtype=np.float64)
+        for row, term in enumerate(terms):
+            col = self.vocab[term]
+            start, end = self.indptr[col], self.indptr[col + 1]
+            column_docs = self.doc_ids[start:end]
+            positions = np.minimum(np.searchsorted(column_docs, docs), len(column_docs) - 1)
+            found = column_docs[positions] == docs
+            tf[row, found] = self.tfs[start:end][positions[found]]
+        
+        idf = self.idf[[self.vocab[term] for term in terms]]
+        contributions = idf[:, None] * (tf * (self.k1 + 1) / (tf + self.doc_norm[docs]))
+        
+        results = []
+        for j, column in enumerate(contributions.T.tolist()):
+            present = tf[:, j] > 0
+            results.append({term: score for term, score, hit in zip(terms, column, present.tolist()) if hit})
+        return results
+
+
+def _index_hits(
+    vector_results: List[Dict[str, Any]], 
+    bm25_results: List[Dict[str, Any]]
+) -> Dict[str, list]:
+    """
+    Map each document_id to [vector_rank, bm25_rank, vector_result, bm25_result].
+    
+    Ranks are 1-based and None where a list does not contain the document;
+    insertion order is vector hits first, then BM25-only hits.
+    """
+    info: Dict[str, list] = {}
+    for rank, result in enumerate(vector_results, 1):
+        doc_id = result.get("document_id")
+        if doc_id:
+            entry = info.setdefault(doc_id, [None, None, None, None])
+            entry[0], entry[2] = rank, result
+    for rank, result in enumerate(bm25_results, 1):
+        doc_id = result.get("document_id")
+        if doc_id:
+            entry = info.setdefault(doc_id, [None, None, None, None])
+            entry[1], entry[3] = rank, result
+    return info
+
+
+def _build_fused_results(
+    info: Dict[str, list], 
+    scores: np.ndarray, 
+    top_k: Optional[int],
+    method: str
+) -> List[Dict[str, Any]]:
+    """Order documents by fused score and build result dicts for the best top_k."""
+    all_doc_ids = list(info)
+    entries = list(info.values())
+    n_docs = len(entries)
+    score_list = scores.tolist()
+    
+    # Sort by fused score (stable, so ties keep vector-then-BM25 order)
+    if top_k is not None and top_k < n_docs:
+        # nlargest is stable too and only keeps a heap of top_k entries
+        top_positions = heapq.nlargest(top_k, range(n_docs), key=score_list.__getitem__)
+    else:
+        top_positions = np.argsort(-scores, kind="stable").tolist()
+    
+    return [_fused_result(all_doc_ids[i], *entries[i], score_list[i], method) for i in top_positions]
+
+
+def _fused_result(doc_id: str, vector_rank: Optional[int], bm25_rank: Optional[int],
+                  vector_result: Optional[Dict[str, Any]], bm25_result: Optional[Dict[str, Any]],
+                  score: float, method: str) -> Dict[str, Any]:
+    """Build one fused result directly instead of copying a source dict and overwriting it.
+    
+    Hits come from the figure searches, which always set every field read here.
+    The score goes under 'fused_score' (with 'fusion_method' naming how it was
+    computed); RRF results also keep it under 'rrf_score' for older readers.
+    """
+    source = vector_result if vector_result is not None else bm25_result
+    cosine_similarity = vector_result["similarity"] if vector_result is not None else 0
+    
+    result = {
+        "text": source["text"],
+        "metadata": source["metadata"],
+        "document_id": doc_id,
+        "cosine_similarity": cosine_similarity,
+        # Keep unified similarity field for backward compatibility
+        "similarity": cosine_similarity,
+        "bm25_score": bm25_result["bm25_score"] if bm25_result is not None else 0,
+        "top_matching_words": bm25_result["top_matching_words"] if bm25_result is not None else [],
+        "fused_score": score,
+        "fusion_method": method,
+        "vector_rank": vector_rank,
+        "bm25_rank": bm25_rank,
+    }
+    if method == "rrf":
+        result["rrf_score"] = score
+    return result
 
 
 def reciprocal_rank_fusion(
     vector_results: List[Dict[str, Any]], 
     bm25_results: List[Dict[str, Any]], 
-    k: int = None
+    k: int = None,
+    top_k: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     Combine vector and BM25 results using Reciprocal Rank Fusion.
     
     Args:
-        vector_results: Results from vector/embedding search with 'document_id' and 'similarity'
-        bm25_results: Results from BM25 keyword search with 'document_id' and 'bm25_score'
+        vector_results: Vector search hits with 'document_id', 'text', 'metadata' and 'similarity'
+        bm25_results: BM25 hits with 'document_id', 'text', 'metadata', 'bm25_score' and 'top_matching_words'
         k: RRF constant (default from config)
+        top_k: Only build the best top_k fused results (default: all)
         
     Returns:
-        Fused results sorted by RRF score with both metrics preserved
+        Fused results sorted by RRF score ('fused_score', also 'rrf_score') with both metrics preserved
     """
     if k is None:
         k = RRF_K
     
-    # Create mappings from document_id to rank and result
-    vector_ranks = {}
-    vector_results_map = {}
-    for rank, result in enumerate(vector_results):
-        doc_id = result.get("document_id")
-        if doc_id:
-            vector_ranks[doc_id] = rank + 1  # 1-based ranking
-            vector_results_map[doc_id] = result
+    # With one list empty, RRF order is that list's own order: skip scoring and sorting
+    # (each retriever returns a document at most once)
+    if not vector_results or not bm25_results:
+        fused_results = []
+        for rank, result in enumerate(vector_results or bm25_results, 1):
+            if top_k is not None and len(fused_results) >= top_k:
+                break
+            doc_id = result.get("document_id")
+            if not doc_id:
+                continue
+            if vector_results:
+                fused_results.append(_fused_result(doc_id, rank, None, result, None, 1.0 / (k + rank), "rrf"))
+            else:
+                fused_results.append(_fused_result(doc_id, None, rank, None, result, 1.0 / (k + rank), "rrf"))
+        return fused_results
     
-    bm25_ranks = {}
-    bm25_results_map = {}
-    for rank, result in enumerate(bm25_results):
-        doc_id = result.get("document_id")
-        if doc_id:
-            bm25_ranks[doc_id] = rank + 1  # 1-based ranking
-            bm25_results_map[doc_id] = result
-    
-    # Calculate RRF scores
-    all_doc_ids = set(vector_ranks.keys()) | set(bm25_ranks.keys())
-    rrf_scores = {}
-    
-    for doc_id in all_doc_ids:
-        rrf_score = 0
-        if doc_id in vector_ranks:
-            rrf_score += 1 / (k + vector_ranks[doc_id])
-        if doc_id in bm25_ranks:
-            rrf_score += 1 / (k + bm25_ranks[doc_id])
-        rrf_scores[doc_id] = rrf_score
-    
-    # Sort by RRF score and create final results
-    sorted_doc_ids = sorted(rrf_scores.keys(), key=lambda x: rrf_scores[x], reverse=True)
-    
-    fused_results = []
-    for doc_id in sorted_doc_ids:
-        # Start with vector result if available, otherwise BM25 result
-        if doc_id in vector_results_map:
-            result = vector_results_map[doc_id].copy()
-            result["cosine_similarity"] = result.get("similarity", 0)
-        else:
-            result = bm25_results_map[doc_id].copy()
-            result["cosine_similarity"] = 0
-        
-        # Add BM25 information if available
-        if doc_id in bm25_results_map:
-            bm25_result = bm25_results_map[doc_id]
-            result["bm25_score"] = bm25_result.get("bm25_score", 0)
-            result["top_matching_words"] = bm25_result.get("top_matching_words", [])
-        else:
-            result["bm25_score"] = 0
-            result["top_matching_words"] = []
-        
-        # Add RRF score and ranking information
-        result["rrf_score"] = rrf_scores[doc_id]
-        result["vector_rank"] = vector_ranks.get(doc_id, None)
-        result["bm25_rank"] = bm25_ranks.get(doc_id, None)
-        
-        # Keep unified similarity field for backward compatibility
-        result["similarity"] = result["cosine_similarity"]
+    info = _index_hits(vector_results, bm25_results)
+    n_docs = len(info)
+    
+    # 1 / (k + rank) for every possible rank, computed once; slot 0 stands for "not ranked"
+    weights = 1.0 / (k + np.arange(max(len(vector_results), len(bm25_results)) + 1, dtype=np.float64))
+    weights[0] = 0.0
+    vector_rank_values = np.fromiter((entry[0] or 0 for entry in info.values()), dtype=np.int64, count=n_docs)
+    bm25_rank_values = np.fromiter((entry[1] or 0 for entry in info.values()), dtype=np.int64, count=n_docs)
+    scores = weights[vector_rank_values] + weights[bm25_rank_values]
+    
+    return _build_fused_results(info, scores, top_k, "rrf")
+
+
+def _min_max_normalize(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Scale the present values to [0, 1]; absent ones become 0, and equal present ones 1."""
+    normalized = np.zeros_like(values)
+    if present.any():
+        low = values[present].min()
+        span = values[present].max() - low
+        normalized[present] = (values[present] - low) / span if span > 0 else 1.0
+    return normalized
+
+
+def combsum_fusion(
+    vector_results: List[Dict[str, Any]], 
+    bm25_results: List[Dict[str, Any]], 
+    alpha: float = None,
+    top_k: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Combine vector and BM25 results by a weighted sum of min-max normalized scores (CombSUM).
+    
+    Unlike RRF this keeps score magnitudes: a hit far ahead of the rest in
+    either list stays far ahead after fusion.
+    
+    Args:
+        vector_results: Vector search hits with 'document_id', 'text', 'metadata' and 'similarity'
+        bm25_results: BM25 hits with 'document_id', 'text', 'metadata', 'bm25_score' and 'top_matching_words'
+        alpha: Weight of the vector score; BM25 gets 1 - alpha (default from config)
+        top_k: Only build the best top_k fused results (default: all)
         
-        fused_results.append(result)
+    Returns:
+        Fused results sorted by fused score ('fused_score') with both metrics preserved
+    """
+    if alpha is None:
+        alpha = FUSION_ALPHA
+    
+    info = _index_hits(vector_results, bm25_results)
+    n_docs = len(info)
+    
+    vector_scores = np.fromiter(
+        (entry[2]["similarity"] if entry[2] is not None else 0 for entry in info.values()),
+        dtype=np.float64, count=n_docs
+    )
+    bm25_scores = np.fromiter(
+        (entry[3]["bm25_score"] if entry[3] is not None else 0 for entry in info.values()),
+        dtype=np.float64, count=n_docs
+    )
+    in_vector = np.fromiter((entry[2] is not None for entry in info.values()), dtype=bool, count=n_docs)
+    in_bm25 = np.fromiter((entry[3] is not None for entry in info.values()), dtype=bool, count=n_docs)
+    
+    scores = (alpha * _min_max_normalize(vector_scores, in_vector)
+              + (1 - alpha) * _min_max_normalize(bm25_scores, in_bm25))
     
-    return fused_results
+    return _build_fused_results(info, scores, top_k, "combsum")
 
 
 def format_search_result_for_response(
@@ -113,6 +326,8 @@ def format_search_result_for_response(
         'similarity': result.get('similarity', 0),
         'cosine_similarity': result.get('cosine_similarity', result.get('similarity', 0)),
         'bm25_score': result.get('bm25_score', 0),
+        'fused_score': result.get('fused_score', result.get('rrf_score', 0)),
+        'fusion_method': result.get('fusion_method', FUSION_METHOD),
         'rrf_score': result.get('rrf_score', 0),
         'top_matching_words': result.get('top_matching_words', []),
         'chunk_index': result['metadata'].get('chunk_index', 0),
@@ -10,7 +10,7 @@ Tokenizer abstraction:
 import re
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Set, Tuple
+from typing import FrozenSet, List, Tuple
 
 logger = logging.getLogger('histfig')
 import nltk
@@ -97,7 +97,7 @@ class TextProcessor:
                 except Exception as e:
                     logger.warning(f"Failed to download NLTK data {data_name}: {e}")
     
-    def _load_stopwords(self, stopwords_dir: str) -> Set[str]:
+    def _load_stopwords(self, stopwords_dir: str) -> FrozenSet[str]:
         """
         Load stopwords from text files in the stopwords directory.
         
@@ -105,14 +105,14 @@ class TextProcessor:
             stopwords_dir: Directory containing stopword files
             
         Returns:
-            Set of stopwords
+            Frozen set of lowercased stopwords
         """
         import os
         stopwords = set()
         
         if not os.path.exists(stopwords_dir):
             logger.warning(f"Stopwords directory not found: {stopwords_dir}")
-            return stopwords
+            return frozenset()
         
         # Load all .txt files in the stopwords directory
         for filename in os.listdir(stopwords_dir):
@@ -128,7 +128,7 @@ class TextProcessor:
                 except Exception as e:
                     logger.warning(f"Error loading stopwords from {filename}: {e}")
         
-        return stopwords
+        return frozenset(stopwords)
     
     def segment_text(self, text: str) -> List[str]:
         """
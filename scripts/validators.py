@@ -6,6 +6,14 @@ Provides validation functions for figure creation and editing.
 import re
 from typing import Dict, Any, Tuple, Optional
 
+# Characters not allowed in figure names; checked with set operations and
+# stripped with str.translate rather than a regex per call
+_INVALID_NAME_CHARS = frozenset('#$%^&*+=\\|`~@')
+_STRIP_INVALID_NAME = str.maketrans('', '', ''.join(_INVALID_NAME_CHARS))
+
+_FIGURE_ID_RE = re.compile(r'^[a-zA-Z_-]+\Z')
+_FIGURE_ID_INVALID_RE = re.compile(r'[^a-zA-Z_-]')
+
 
 def validate_figure_id(figure_id: str) -> Tuple[bool, Optional[str]]:
     """
@@ -25,7 +33,7 @@ def validate_figure_id(figure_id: str) -> Tuple[bool, Optional[str]]:
         return False, "Figure ID must be 50 characters or less"
     
     # Allow letters (uppercase and lowercase), underscores, and hyphens
-    if not re.match(r'^[a-zA-Z_-]+$', figure_id):
+    if not _FIGURE_ID_RE.match(figure_id):
         return False, "Figure ID must contain only letters, underscores, and hyphens (no numbers, spaces, or other special characters)"
     
     return True, None
@@ -51,7 +59,7 @@ def validate_figure_name(name: str) -> Tuple[bool, Optional[str]]:
     # Block only dangerous/unusual special characters
     # Allow: letters (including Unicode/Chinese), spaces, hyphens, periods, commas,
     # colons, semicolons, quotes, parentheses, brackets, and common CJK punctuation
-    if re.search(r'[#$%^&*+=\\|`~@]', name):
+    if not _INVALID_NAME_CHARS.isdisjoint(name):
         return False, "Figure name contains invalid characters"
     
     return True, None
@@ -191,7 +199,7 @@ def sanitize_figure_id(figure_id: str) -> str:
         Sanitized figure ID
     """
     # Remove all characters except letters, underscores, and hyphens
-    sanitized = re.sub(r'[^a-zA-Z_-]', '', figure_id)
+    sanitized = _FIGURE_ID_INVALID_RE.sub('', figure_id)
     
     # Convert to lowercase for consistency
     sanitized = sanitized.lower()
@@ -211,7 +219,7 @@ def sanitize_figure_name(name: str) -> str:
         Sanitized figure name
     """
     # Remove only dangerous/unusual special characters
-    sanitized = re.sub(r'[#$%^&*+=\\|`~@]', '', name)
+    sanitized = name.translate(_STRIP_INVALID_NAME)
     
     # Remove multiple spaces
     sanitized = ' '.join(sanitized.split())